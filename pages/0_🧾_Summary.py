@@ -8,7 +8,36 @@ from src.components.auth_ui import require_authentication, get_current_user_info
 from src.components.database import db_manager
 from src.calculations.utils import format_error_message
 from src.integrations.xai_client import draft_weekly_email
-from src.integrations.email_sender import send_email, EmailSendError
+from src.integrations.email_sender import send_email
+from src.utils import parse_subject
+
+
+def send_and_record(user_id: int, recipient: str, subject: str, body_text: str) -> bool:
+    """Send the email, then record the attempt with its final status in a single write.
+
+    SMTP is synchronous, so the outcome is known before the record is written.
+    Every attempt is recorded, whatever the send raised. Returns True if sent.
+    """
+    status, error_message = 'failed', None
+    try:
+        ok = send_email(recipient, subject, body_text)
+        if ok:
+            status = 'sent'
+            st.success("✅ Email sent successfully!")
+        else:
+            error_message = 'Unknown error'
+            st.error("❌ Failed to send email.")
+    except Exception as e:
+        # EmailSendError, or a connection error it did not wrap (SMTPServerDisconnected, OSError)
+        error_message = str(e) or type(e).__name__
+        st.error(f"❌ Failed to send email: {format_error_message(e)}")
+
+    try:
+        db_manager.save_sent_email(user_id, recipient, subject, body_text,
+                                   status=status, error_message=error_message)
+    except Exception as e:
+        st.error(f"Failed to record email in DB: {format_error_message(e)}")
+    return status == 'sent'
 
 
 def main():
@@ -81,6 +110,8 @@ def main():
 
     if st.button("✉️ Draft Mail", type="primary", use_container_width=True, disabled=not notes):
         with st.spinner("Calling Grok to draft your email..."):
+            # Streamed preview; replaced by the editable draft once complete
+            preview = st.empty()
             try:
                 # Look up manager name for salutation
                 mgr = db_manager.get_manager_info(user['id']) or {}
@@ -92,11 +123,14 @@ def main():
                     include_subject=include_subject,
                     max_bullets=max_bullets,
                     recipient_name=recipient_name,
+                    on_progress=preview.text,
                 )
                 st.session_state.email_draft_text = draft
                 st.success("Draft generated!")
             except Exception as e:
                 st.error(format_error_message(e))
+            finally:
+                preview.empty()
 
     # Show draft and send controls if we have a draft
     if st.session_state.get('email_draft_text'):
@@ -105,12 +139,7 @@ def main():
         st.session_state.email_draft_text = draft
 
         # Extract subject if the draft includes a `Subject:` first line
-        subject = "Weekly Update"
-        body_text = draft
-        if draft.startswith("Subject:"):
-            first_line, _, rest = draft.partition("\n")
-            subject = first_line.replace("Subject:", "").strip() or subject
-            body_text = rest.lstrip("\n")
+        subject, body_text = parse_subject(draft)
 
         # Confirmation input for recipient email (default from DB)
         st.markdown("---")
@@ -130,29 +159,7 @@ def main():
             if not recipient_input or "@" not in recipient_input:
                 st.error("Please enter a valid recipient email address.")
             else:
-                # Save to DB as 'queued'
-                try:
-                    email_id = db_manager.save_sent_email(user['id'], recipient_input, subject, body_text, status='queued')
-                except Exception as e:
-                    email_id = None
-                    st.error(f"Failed to record email in DB: {format_error_message(e)}")
-
-                # Attempt to send
-                try:
-                    ok = send_email(recipient_input, subject, body_text)
-                    if ok:
-                        if email_id:
-                            db_manager.update_sent_email_status(email_id, 'sent', None)
-                        st.success("✅ Email sent successfully!")
-                    else:
-                        if email_id:
-                            db_manager.update_sent_email_status(email_id, 'failed', 'Unknown error')
-                        st.error("❌ Failed to send email.")
-                except EmailSendError as e:
-                    if email_id:
-                        db_manager.update_sent_email_status(email_id, 'failed', str(e))
-                    st.error(f"❌ Failed to send email: {format_error_message(e)}")
-
+                send_and_record(user['id'], recipient_input, subject, body_text)
 
 
 if __name__ == "__main__":
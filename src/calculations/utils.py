@@ -2,89 +2,129 @@
 Utility functions for validation and error handling.
 """
 import re
+from functools import lru_cache
 from typing import Tuple
 
+# validate_note_content error messages; always returned as these same objects
+MSG_EMPTY = "Note content cannot be empty."
+MSG_TOO_SHORT = "Note must be at least 5 characters long."
+MSG_TOO_LONG = "Note cannot exceed 5000 characters."
+MSG_HARMFUL = "Note contains potentially harmful content."
+
+# Potentially harmful content (basic XSS prevention), compiled once as a single
+# alternation. Patterns are kept precise to avoid false positives with Markdown.
+_DANGEROUS_RE = re.compile(
+    r'<script.*?>.*?</script>'         # Script tags
+    r'|javascript:'                    # JavaScript URLs
+    r'|<[^>]*\son\w+\s*='              # HTML event handlers (onclick, onload, etc.) within tags
+    r'|\bon\w+\s*=\s*["\'][^"\']*["\']',  # Standalone event handlers with quotes
+    re.IGNORECASE,
+)
+
+# Only inputs up to this length are memoized: short inputs (empty fields, titles,
+# one-liners) repeat across reruns, while full note bodies are rarely validated
+# twice and would only keep users' private text in process memory
+MEMOIZE_MAX_LENGTH = 64
+
 def validate_note_content(content: str) -> Tuple[bool, str]:
     """
     Validate note content.
-    
+
     Args:
         content (str): The note content to validate
         
     Returns:
         Tuple[bool, str]: (is_valid, error_message)
     """
-    if not content or not content.strip():
-        return False, "Note content cannot be empty."
-    
+    if not content or len(content) <= MEMOIZE_MAX_LENGTH:
+        return _validate_short_note_content(content)
+    return _validate_note_content(content)
+
+def _validate_note_content(content: str) -> Tuple[bool, str]:
+    # Strip once; both the empty and minimum-length checks use the trimmed length
+    stripped_length = len(content.strip()) if content else 0
+    if not stripped_length:
+        return False, MSG_EMPTY
+
     # Check minimum length
-    if len(content.strip()) < 5:
-        return False, "Note must be at least 5 characters long."
-    
+    if stripped_length < 5:
+        return False, MSG_TOO_SHORT
+
     # Check maximum length
     if len(content) > 5000:
-        return False, "Note cannot exceed 5000 characters."
-    
+        return False, MSG_TOO_LONG
+
     # Check for potentially harmful content (basic XSS prevention)
-    # More precise patterns to avoid false positives with Markdown
-    dangerous_patterns = [
-        r'<script.*?>.*?</script>',  # Script tags
-        r'javascript:',              # JavaScript URLs
-        r'<[^>]*\son\w+\s*=',       # HTML event handlers (onclick, onload, etc.) within tags
-        r'\bon\w+\s*=\s*["\'][^"\']*["\']',  # Standalone event handlers with quotes
-    ]
-    
-    for pattern in dangerous_patterns:
-        if re.search(pattern, content, re.IGNORECASE):
-            return False, "Note contains potentially harmful content."
-    
+    if _DANGEROUS_RE.search(content):
+        return False, MSG_HARMFUL
+
     return True, ""
 
+_validate_short_note_content = lru_cache(maxsize=1024)(_validate_note_content)
+
+# Deletes null bytes and control characters other than newline and tab
+_CONTROL_CHARS_TABLE = dict.fromkeys(c for c in range(32) if chr(c) not in '\n\t')
+
 def sanitize_input(text: str) -> str:
     """
     Sanitize user input by removing potentially harmful characters.
-    
+
     Args:
         text (str): Input text to sanitize
         
     Returns:
         str: Sanitized text
     """
+    if not text or len(text) <= MEMOIZE_MAX_LENGTH:
+        return _sanitize_short_input(text)
+    return _sanitize_input(text)
+
+def _sanitize_input(text: str) -> str:
     if not text:
         return ""
-    
+
     # Remove null bytes and control characters except newlines and tabs
-    sanitized = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t')
-    
+    sanitized = text.translate(_CONTROL_CHARS_TABLE)
+
     # Trim whitespace
     return sanitized.strip()
 
+_sanitize_short_input = lru_cache(maxsize=1024)(_sanitize_input)
+
+def clear_caches() -> None:
+    """
+    Clear the memoized validate_note_content and sanitize_input results.
+    """
+    _validate_short_note_content.cache_clear()
+    _sanitize_short_input.cache_clear()
+
+# Map common database errors (by exception class name) to user-friendly messages
+_ERROR_MESSAGES = {
+    'OperationalError': 'Database connection issue. Please try again later.',
+    'IntegrityError': 'Data validation error. Please check your input.',
+    'ProgrammingError': 'Database query error. Please contact support.',
+    'DataError': 'Invalid data format. Please check your input.',
+}
+
 def format_error_message(error: Exception) -> str:
     """
     Format error messages for user display.
-    
+
     Args:
         error (Exception): The exception to format
         
     Returns:
         str: User-friendly error message
     """
-    error_type = type(error).__name__
-    
-    # Map common database errors to user-friendly messages
-    error_mappings = {
-        'OperationalError': 'Database connection issue. Please try again later.',
-        'IntegrityError': 'Data validation error. Please check your input.',
-        'ProgrammingError': 'Database query error. Please contact support.',
-        'DataError': 'Invalid data format. Please check your input.',
-    }
-    
-    return error_mappings.get(error_type, f"An unexpected error occurred: {str(error)}")
+    message = _ERROR_MESSAGES.get(type(error).__name__)
+    if message is None:
+        return f"An unexpected error occurred: {str(error)}"
+    return message
 
 def truncate_text(text: str, max_length: int = 100) -> str:
     """
     Truncate text to a maximum length with ellipsis.
-    
+
     Args:
         text (str): Text to truncate
         max_length (int): Maximum length before truncation
@@ -1,12 +1,23 @@
 """
 Database connection and operations for the Daily Notes application.
 """
+import csv
+import functools
+import io
+import logging
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import re
+import string
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-import toml
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from src.utils.secrets import load_secrets_from_toml
 
 # Import streamlit only when available (for non-CLI usage)
 try:
@@ -21,78 +32,432 @@ except ImportError:
         def info(self, msg): print(f"INFO: {msg}")
     st = MockStreamlit()
 
-def load_secrets_from_toml():
-    """Load secrets from .streamlit/secrets.toml file."""
-    secrets_path = os.path.join('.streamlit', 'secrets.toml')
-    if os.path.exists(secrets_path):
-        try:
-            with open(secrets_path, 'r') as f:
-                return toml.load(f)
-        except Exception as e:
-            print(f"Warning: Could not load secrets.toml: {e}")
-    return None
+logger = logging.getLogger(__name__)
+
+# psycopg2 loads libpq and its C extension; import it on first use only
+_psycopg2 = None
+
+def _pg():
+    """Return the psycopg2 module (with extras and pool loaded), importing it on first call."""
+    global _psycopg2
+    if _psycopg2 is None:
+        import psycopg2
+        import psycopg2.extras
+        import psycopg2.pool
+        _psycopg2 = psycopg2
+    return _psycopg2
+
+def _cached_lookup(method):
+    """Serve a single-argument read-only lookup from the manager's TTL cache.
+
+    Empty results (not found, or a failed query) are not cached, so a freshly
+    created user or tag is visible immediately. Callers get shallow copies.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__,) + args + tuple(kwargs.values())
+        with self._cache_lock:
+            value = self._cache.get(key)
+        if value is None:
+            value = method(self, *args, **kwargs)
+            if value:
+                with self._cache_lock:
+                    self._cache[key] = value
+        if isinstance(value, list):
+            return [dict(row) for row in value]
+        return dict(value) if value else value
+    return wrapper
+
+def _db_op(error_msg: str, default=None, read_only: bool = False):
+    """Run a DatabaseManager method inside a pooled connection's transaction.
+
+    The method receives the connection after self. `with conn` commits when it
+    returns and rolls back when it raises. read_only methods run on the
+    autocommit connection directly, since `with conn` would still send
+    BEGIN/COMMIT even in autocommit mode. Database errors are logged with
+    error_msg and, like a missing connection, turn into `default` (called
+    first if it is a factory such as list). Methods that drop cached rows
+    commit explicitly before doing so, so a concurrent read cannot re-cache
+    the old values.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._checkout(read_only=read_only) as conn:
+                if conn:
+                    try:
+                        if read_only:
+                            return method(self, conn, *args, **kwargs)
+                        with conn:
+                            return method(self, conn, *args, **kwargs)
+                    except _pg().Error:
+                        logger.exception(error_msg)
+            return default() if callable(default) else default
+        return wrapper
+    return decorator
+
+# Column order of fixed-shape SELECTs read through plain tuple cursors
+_TAG_COLUMNS = ('id', 'name', 'color', 'created_at')
+_USER_LIST_COLUMNS = ('id', 'username', 'email', 'display_name', 'is_active', 'created_at', 'last_login')
+
+# Hot statements executed as server-side prepared statements on pooled connections:
+# name -> (parameter types, SQL with $n placeholders)
+_PREPARED_STATEMENTS = {
+    'save_note_stmt': (
+        'integer, text',
+        "INSERT INTO notes (user_id, content) VALUES ($1, $2)"
+    ),
+    'get_user_by_username_stmt': (
+        'text',
+        """SELECT id, username, email, password_hash, display_name, is_active,
+                  created_at, updated_at, last_login
+           FROM app_users WHERE username = $1 AND is_active = TRUE"""
+    ),
+    'update_user_last_login_stmt': (
+        'integer',
+        """UPDATE app_users
+           SET last_login = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+           WHERE id = $1"""
+    ),
+    'get_user_tags_stmt': (
+        'integer',
+        "SELECT id, name, color, created_at FROM tags WHERE user_id = $1 ORDER BY name"
+    ),
+}
+# The same statements with client-side placeholders, for connections outside the pool
+_PLAIN_STATEMENTS = {
+    name: re.sub(r'\$\d+', '%s', sql) for name, (_types, sql) in _PREPARED_STATEMENTS.items()
+}
+
+# Note listings: the (note, tag) join shape that _group_note_rows folds back into notes
+_SQL_NOTE_ROWS = """
+    SELECT n.id, n.content, n.note_date, n.created_at,
+           t.id as tag_id, t.name as tag_name, t.color as tag_color
+    FROM notes n
+"""
+_SQL_NOTES_IN_RANGE = _SQL_NOTE_ROWS + """
+    LEFT JOIN note_tags nt ON n.id = nt.note_id
+    LEFT JOIN tags t ON nt.tag_id = t.id
+    WHERE n.user_id = %s
+    AND n.note_date BETWEEN %s AND %s
+    ORDER BY n.note_date DESC, n.created_at DESC
+"""
+_SQL_NOTES_BY_TAG = _SQL_NOTE_ROWS + """
+    INNER JOIN note_tags nt ON n.id = nt.note_id
+    INNER JOIN tags t ON nt.tag_id = t.id
+    WHERE n.user_id = %s AND t.id = %s
+    ORDER BY n.note_date DESC, n.created_at DESC
+    LIMIT %s
+"""
+_SQL_RECENT_NOTES = _SQL_NOTE_ROWS + """
+    LEFT JOIN note_tags nt ON n.id = nt.note_id
+    LEFT JOIN tags t ON nt.tag_id = t.id
+    WHERE n.user_id = %s
+    ORDER BY n.note_date DESC, n.created_at DESC
+    LIMIT %s
+"""
+
+# Notes with their tags aggregated server-side, one row per note (see _NOTE_COLUMNS)
+_NOTE_COLUMNS = ('id', 'content', 'note_date', 'created_at', 'tags')
+_SQL_NOTES_WITH_TAGS = """
+    SELECT n.id, n.content, n.note_date, n.created_at,
+           COALESCE(
+               json_agg(json_build_object('id', t.id, 'name', t.name, 'color', t.color))
+                   FILTER (WHERE t.id IS NOT NULL),
+               '[]'::json
+           ) AS tags
+    FROM notes n
+    LEFT JOIN note_tags nt ON n.id = nt.note_id
+    LEFT JOIN tags t ON nt.tag_id = t.id
+"""
+# The id list is bound as a single array parameter, so the statement text is the same for any count
+_SQL_NOTES_BY_IDS = _SQL_NOTES_WITH_TAGS + """
+    WHERE n.user_id = %s AND n.id = ANY(%s)
+    GROUP BY n.id
+    ORDER BY n.note_date DESC, n.created_at DESC
+"""
+_SQL_ALL_NOTES_FOR_USER = _SQL_NOTES_WITH_TAGS + """
+    WHERE n.user_id = %s
+    GROUP BY n.id
+    ORDER BY n.note_date DESC, n.created_at DESC
+"""
+
+_SQL_GET_USER_BY_EMAIL = """
+    SELECT id, username, email, password_hash, display_name, is_active,
+           created_at, updated_at, last_login
+    FROM app_users WHERE email = %s AND is_active = TRUE
+"""
+_SQL_GET_USER_BY_ID = """
+    SELECT id, username, email, display_name, is_active,
+           created_at, updated_at, last_login
+    FROM app_users WHERE id = %s AND is_active = TRUE
+"""
+_SQL_CREATE_USER = """
+    INSERT INTO app_users (username, email, password_hash, display_name)
+    VALUES (%s, %s, %s, %s)
+    RETURNING id, username, email, display_name, is_active,
+              created_at, updated_at, last_login
+"""
+# Default names Postgres gives the inline UNIQUE constraints on app_users
+_USER_UNIQUE_FIELDS = {
+    'app_users_username_key': 'username',
+    'app_users_email_key': 'email',
+}
+# Bulk inserts take each column as one array parameter. Ids are drawn from the
+# sequence per input row up front, because the order of a multi-row INSERT's
+# RETURNING output is not guaranteed; the final SELECT pairs them by ordinality.
+_SQL_SAVE_NOTES_WITH_TAGS = """
+    WITH input AS (
+        SELECT nextval(pg_get_serial_sequence('notes', 'id')) AS id, t.*
+        FROM unnest(%s::text[], %s::date[], %s::integer[])
+             WITH ORDINALITY AS t(content, note_date, tag_id, ord)
+    ), new_notes AS (
+        INSERT INTO notes (id, user_id, content, note_date)
+        SELECT id, %s, content, COALESCE(note_date, CURRENT_DATE) FROM input
+    ), new_note_tags AS (
+        INSERT INTO note_tags (note_id, tag_id)
+        SELECT id, tag_id FROM input WHERE tag_id IS NOT NULL
+    )
+    SELECT id FROM input ORDER BY ord
+"""
+_SQL_SAVE_SENT_EMAILS = """
+    WITH input AS (
+        SELECT nextval(pg_get_serial_sequence('sent_emails', 'id')) AS id, t.*
+        FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], %s::text[])
+             WITH ORDINALITY AS t(to_email, subject, body, status, error_message, ord)
+    ), new_rows AS (
+        INSERT INTO sent_emails (id, user_id, to_email, subject, body, status, error_message)
+        SELECT id, %s, to_email, subject, body, status, error_message FROM input
+    )
+    SELECT id FROM input ORDER BY ord
+"""
+_SQL_GET_ALL_USERS = """
+    SELECT id, username, email, display_name, is_active, created_at, last_login
+    FROM app_users WHERE is_active = TRUE ORDER BY display_name
+"""
+
+def _group_note_rows(rows) -> List[Dict]:
+    """Fold (note, tag) join rows into one dict per note with a 'tags' list, keeping row order.
+
+    Rows are tuples: id, content, note_date, created_at, tag_id, tag_name, tag_color.
+    """
+    notes = {}
+    for note_id, content, note_date, created_at, tag_id, tag_name, tag_color in rows:
+        note = notes.get(note_id)
+        if note is None:
+            note = notes[note_id] = {
+                'id': note_id,
+                'content': content,
+                'note_date': note_date,
+                'created_at': created_at,
+                'tags': []
+            }
+        if tag_id:
+            note['tags'].append({'id': tag_id, 'name': tag_name, 'color': tag_color})
+    return list(notes.values())
+
+# Lowercases ASCII letters and turns spaces into underscores in a single pass
+_SLUG_TABLE = str.maketrans(string.ascii_uppercase + ' ', string.ascii_lowercase + '_')
+
+def _slugify(display_name: str) -> str:
+    """Username slug for a display name: lowercase, spaces as underscores."""
+    if display_name.isascii():
+        return display_name.translate(_SLUG_TABLE)
+    # Non-ASCII names need Unicode-aware lower()
+    return display_name.lower().replace(" ", "_")
 
 class DatabaseManager:
-    """Manages database connections and operations."""
+    """Manages database connections and operations.
+
+    Methods are synchronous on purpose: Streamlit runs each session's script on
+    its own thread, so concurrent users are served through the shared
+    ThreadedConnectionPool rather than an event loop.
+    """
+
+    # Parameters that must be present (non-empty) for a configuration source to be used
+    _REQUIRED_PARAMS = ('host', 'database', 'user', 'password')
+
+    # Connection pool sizing; the pool itself is created on first use
+    POOL_MIN_CONN = 2
+    POOL_MAX_CONN = 20
+    # Pooled connections idle for longer than this are probed before reuse
+    POOL_IDLE_CHECK_SECONDS = 30
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    # (name, color) tags every new user starts with
+    DEFAULT_TAGS = [
+        ("Professional", "#1f77b4"),
+        ("Personal", "#ff7f0e"),
+        ("Learning", "#2ca02c"),
+    ]
+
+    # Short-lived cache for user/tag lookups that run on every Streamlit rerun
+    CACHE_MAXSIZE = 1024
+    CACHE_TTL_SECONDS = 30
 
     def __init__(self):
+        self._cache = TTLCache(maxsize=self.CACHE_MAXSIZE, ttl=self.CACHE_TTL_SECONDS)
+        self._cache_lock = threading.Lock()
+
         # Priority order (local/tests first): secrets.toml > environment variables > Streamlit secrets (fallback)
         self.connection_params = None
+        for source, params in self._try_sources():
+            if all(params[key] is not None and params[key] != "" for key in self._REQUIRED_PARAMS):
+                print(f"Using {source} for database configuration")
+                self.connection_params = params
+                break
 
+        # Validate that we have all required parameters
+        if self.connection_params is None:
+            raise ValueError("Missing required database configuration parameters. Please check your secrets.toml file or environment variables.")
+
+    @staticmethod
+    def _try_sources():
+        """Yield (source name, connection params) candidates in priority order.
+
+        Candidates are built lazily, so later sources are never read once an
+        earlier one has been accepted by the caller.
+        """
         # 1. Try secrets.toml file (for local development and tests)
         secrets = load_secrets_from_toml()
         if secrets and 'database' in secrets:
             db_config = secrets['database']
-            self.connection_params = {
+            yield "secrets.toml", {
                 'host': db_config.get('DB_HOST'),
                 'database': db_config.get('DB_NAME'),
                 'user': db_config.get('DB_USER'),
                 'password': db_config.get('DB_PASSWORD'),
                 'port': db_config.get('DB_PORT', 5432)
             }
-            print("Using secrets.toml for database configuration")
 
         # 2. Fallback to environment variables (legacy support)
-        if not self.connection_params or not all(self.connection_params.values()):
-            self.connection_params = {
-                'host': os.getenv('DB_HOST'),
-                'database': os.getenv('DB_NAME'),
-                'user': os.getenv('DB_USER'),
-                'password': os.getenv('DB_PASSWORD'),
-                'port': os.getenv('DB_PORT', 5432)
-            }
-            if all(self.connection_params.values()):
-                print("Using environment variables for database configuration")
+        yield "environment variables", {
+            'host': os.getenv('DB_HOST'),
+            'database': os.getenv('DB_NAME'),
+            'user': os.getenv('DB_USER'),
+            'password': os.getenv('DB_PASSWORD'),
+            'port': os.getenv('DB_PORT', 5432)
+        }
 
         # 3. Fallback to Streamlit secrets (for cloud deployment)
-        if (not self.connection_params or not all(self.connection_params.values())) \
-           and STREAMLIT_AVAILABLE and hasattr(st, 'secrets') and 'database' in st.secrets:
-            self.connection_params = {
+        if STREAMLIT_AVAILABLE and hasattr(st, 'secrets') and 'database' in st.secrets:
+            yield "Streamlit secrets", {
                 'host': st.secrets.database.DB_HOST,
                 'database': st.secrets.database.DB_NAME,
                 'user': st.secrets.database.DB_USER,
                 'password': st.secrets.database.DB_PASSWORD,
                 'port': st.secrets.database.get('DB_PORT', 5432)
             }
-            print("Using Streamlit secrets for database configuration")
 
-        # Validate that we have all required parameters
-        if not all([self.connection_params.get('host'),
-                   self.connection_params.get('database'),
-                   self.connection_params.get('user'),
-                   self.connection_params.get('password')]):
-            raise ValueError("Missing required database configuration parameters. Please check your secrets.toml file or environment variables.")
+    def _get_pool(self):
+        """Return the connection pool, creating it on first use.
+
+        Creation is deferred so that building the manager at import time does
+        not fail while the database is unreachable.
+        """
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._last_used = {}
+                    self._prepared = weakref.WeakKeyDictionary()
+                    self._pool = _pg().pool.ThreadedConnectionPool(
+                        self.POOL_MIN_CONN, self.POOL_MAX_CONN, **self.connection_params
+                    )
+        return self._pool
+
+    def _is_usable(self, conn) -> bool:
+        """Probe a connection that sat idle in the pool; recently used ones are trusted."""
+        last_used = self._last_used.pop(id(conn), None)
+        if last_used is None or time.monotonic() - last_used < self.POOL_IDLE_CHECK_SECONDS:
+            return True
+        psycopg2 = _pg()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()  # end the probe's implicit transaction
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
 
     def get_connection(self):
-        """Create and return a database connection."""
+        """Check out a database connection from the pool.
+
+        A stale pooled connection (server restart, idle timeout, dropped TCP
+        session) is discarded and replaced once so it does not surface as a
+        user-visible error. Return it with release_connection().
+        """
         try:
-            conn = psycopg2.connect(**self.connection_params)
+            pool = self._get_pool()
+            conn = pool.getconn()
+            if not self._is_usable(conn):
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
             return conn
-        except Exception as e:
-            st.error(f"Database connection error: {e}")
+        except Exception:
+            logger.exception("Database connection error")
             return None
 
-    def create_tables(self):
+    def release_connection(self, conn, close: bool = False):
+        """Return a connection obtained from get_connection()."""
+        if self._pool is None:
+            # Not pool-managed (e.g. supplied directly); just close it
+            conn.close()
+            return
+        if not close:
+            self._last_used[id(conn)] = time.monotonic()
+        self._pool.putconn(conn, close=close)
+
+    def _execute_prepared(self, conn, cursor, name: str, params: tuple):
+        """Run a registered hot statement, preparing it on first use per pooled connection.
+
+        Prepared statements live in the server session, so parse/plan happens once
+        per connection instead of on every call.
+        """
+        if self._pool is None:
+            cursor.execute(_PLAIN_STATEMENTS[name], params)
+            return
+        prepared = self._prepared.setdefault(conn, set())
+        if name not in prepared:
+            types, sql = _PREPARED_STATEMENTS[name]
+            cursor.execute(f"PREPARE {name} ({types}) AS {sql}")
+            prepared.add(name)
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+    @contextmanager
+    def _checkout(self, read_only: bool = False):
+        """Borrow a connection for the duration of a block; yields None if unavailable.
+
+        read_only blocks run in autocommit mode, so plain SELECTs skip the implicit
+        BEGIN and leave no open transaction for the pool to roll back on return.
+        """
+        conn = self.get_connection()
+        try:
+            if conn and read_only:
+                conn.autocommit = True
+            yield conn
+        finally:
+            if conn:
+                if read_only and not conn.closed:
+                    conn.autocommit = False
+                self.release_connection(conn)
+
+    def _invalidate_user(self, user_id: int):
+        """Drop cached lookups (by id, username or email) of one user."""
+        with self._cache_lock:
+            for key, value in list(self._cache.items()):
+                if key[0] in ('get_user_by_id', 'get_user_by_username', 'get_user_by_email') \
+                        and value.get('id') == user_id:
+                    self._cache.pop(key, None)
+
+    def _invalidate_tags(self, user_id: int):
+        """Drop the cached tag list of one user."""
+        with self._cache_lock:
+            self._cache.pop(('get_user_tags', user_id), None)
+
+    @_db_op("Error creating tables", default=False)
+    def create_tables(self, conn):
         """Create required tables if they don't exist."""
         create_app_users_table = """
         CREATE TABLE IF NOT EXISTS app_users (
@@ -180,32 +545,36 @@ class DatabaseManager:
         CREATE INDEX IF NOT EXISTS idx_notes_note_date ON notes(note_date);
         """
 
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute(create_app_users_table)
-                    cursor.execute(create_notes_table)
-                    cursor.execute(create_tags_table)
-                    cursor.execute(create_note_tags_table)
-                    cursor.execute(create_sent_emails_table)
-                    cursor.execute(create_username_index)
-                    cursor.execute(create_email_index)
-                    cursor.execute(create_tags_user_index)
-                    cursor.execute(create_note_tags_note_index)
-                    cursor.execute(create_note_tags_tag_index)
-                    cursor.execute(create_notes_date_index)
-                    conn.commit()
-                    return True
-            except psycopg2.Error as e:
-                st.error(f"Error creating tables: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
+        # Serves per-user note listings (ORDER BY note_date DESC, created_at DESC) and week ranges
+        create_notes_user_date_index = """
+        CREATE INDEX IF NOT EXISTS idx_notes_user_date ON notes(user_id, note_date DESC, created_at DESC);
+        """
 
-    def insert_sample_users(self):
+        create_sent_emails_user_index = """
+        CREATE INDEX IF NOT EXISTS idx_sent_emails_user_created ON sent_emails(user_id, created_at DESC);
+        """
+
+        # One round trip for the whole script
+        with conn.cursor() as cursor:
+            cursor.execute(
+                create_app_users_table
+                + create_notes_table
+                + create_tags_table
+                + create_note_tags_table
+                + create_sent_emails_table
+                + create_username_index
+                + create_email_index
+                + create_tags_user_index
+                + create_note_tags_note_index
+                + create_note_tags_tag_index
+                + create_notes_date_index
+                + create_notes_user_date_index
+                + create_sent_emails_user_index
+            )
+        return True
+
+    @_db_op("Error inserting sample users", default=False)
+    def insert_sample_users(self, conn):
         """Insert sample users for the PoC."""
         sample_users = [
             "Alice Johnson",
@@ -215,228 +584,177 @@ class DatabaseManager:
             "Emma Brown"
         ]
 
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    for user_name in sample_users:
-                        cursor.execute(
-                            "INSERT INTO app_users (name) VALUES (%s) ON CONFLICT (name) DO NOTHING",
-                            (user_name,)
-                        )
-                    conn.commit()
-                    return True
-            except psycopg2.Error as e:
-                st.error(f"Error inserting sample users: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
+        with conn.cursor() as cursor:
+            _pg().extras.execute_values(
+                cursor,
+                "INSERT INTO app_users (name) VALUES %s ON CONFLICT (name) DO NOTHING",
+                [(user_name,) for user_name in sample_users]
+            )
+            return True
 
-    def create_user_with_auth(self, username: str, email: str, password_hash: str, display_name: str) -> Optional[int]:
+    @_db_op("Error creating user", default=None)
+    def create_user_with_auth(self, conn, username: str, email: str, password_hash: str, display_name: str) -> Optional[int]:
         """Create a new user with authentication credentials."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        INSERT INTO app_users (username, email, password_hash, display_name)
-                        VALUES (%s, %s, %s, %s)
-                        RETURNING id
-                    """, (username, email, password_hash, display_name))
-                    user_id = cursor.fetchone()[0]
-                    conn.commit()
-                    return user_id
-            except psycopg2.Error as e:
-                st.error(f"Error creating user: {e}")
-                conn.rollback()
-                return None
-            finally:
-                conn.close()
-        return None
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_CREATE_USER, (username, email, password_hash, display_name))
+            return cursor.fetchone()[0]
 
-    def get_user_by_username(self, username: str) -> Optional[Dict]:
+    @_db_op("Error creating user", default=(None, None))
+    def create_user_atomic(self, conn, username: str, email: str, password_hash: str, display_name: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """Insert a user and the default tags without checking for duplicates first.
+
+        The unique constraints decide instead, so there is no race between check and
+        insert. Returns (user, None) on success or (None, 'username' | 'email') naming
+        the field that is already taken.
+        """
+        try:
+            with conn.cursor(cursor_factory=_pg().extras.RealDictCursor) as cursor:
+                cursor.execute(_SQL_CREATE_USER, (username, email, password_hash, display_name))
+                user = cursor.fetchone()
+                self._insert_default_tags(cursor, user['id'])
+        except _pg().IntegrityError as e:
+            field = _USER_UNIQUE_FIELDS.get(getattr(e.diag, 'constraint_name', None))
+            if field is None:
+                raise
+            conn.rollback()
+            return None, field
+        return user, None
+
+    def _insert_default_tags(self, cursor, user_id: int) -> None:
+        """Give a new user the DEFAULT_TAGS in one multi-row INSERT."""
+        _pg().extras.execute_values(
+            cursor,
+            "INSERT INTO tags (user_id, name, color) VALUES %s",
+            [(user_id, name, color) for name, color in self.DEFAULT_TAGS]
+        )
+
+    @_cached_lookup
+    @_db_op("Error fetching user by username", default=None, read_only=True)
+    def get_user_by_username(self, conn, username: str) -> Optional[Dict]:
         """Get user by username."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT id, username, email, password_hash, display_name, is_active,
-                               created_at, updated_at, last_login
-                        FROM app_users WHERE username = %s AND is_active = TRUE
-                    """, (username,))
-                    user = cursor.fetchone()
-                    return dict(user) if user else None
-            except psycopg2.Error as e:
-                st.error(f"Error fetching user by username: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+        with conn.cursor(cursor_factory=_pg().extras.RealDictCursor) as cursor:
+            self._execute_prepared(conn, cursor, 'get_user_by_username_stmt', (username,))
+            return cursor.fetchone()
 
-    def get_user_by_email(self, email: str) -> Optional[Dict]:
+    @_cached_lookup
+    @_db_op("Error fetching user by email", default=None, read_only=True)
+    def get_user_by_email(self, conn, email: str) -> Optional[Dict]:
         """Get user by email."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT id, username, email, password_hash, display_name, is_active,
-                               created_at, updated_at, last_login
-                        FROM app_users WHERE email = %s AND is_active = TRUE
-                    """, (email,))
-                    user = cursor.fetchone()
-                    return dict(user) if user else None
-            except psycopg2.Error as e:
-                st.error(f"Error fetching user by email: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+        with conn.cursor(cursor_factory=_pg().extras.RealDictCursor) as cursor:
+            cursor.execute(_SQL_GET_USER_BY_EMAIL, (email,))
+            return cursor.fetchone()
 
-    def update_user_last_login(self, user_id: int) -> bool:
+    @_db_op("Error updating last login", default=False)
+    def update_user_last_login(self, conn, user_id: int) -> bool:
         """Update user's last login timestamp."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        UPDATE app_users
-                        SET last_login = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """, (user_id,))
-                    conn.commit()
-                    return cursor.rowcount > 0
-            except psycopg2.Error as e:
-                st.error(f"Error updating last login: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
-
-    def update_user_password(self, user_id: int, password_hash: str) -> bool:
+        with conn.cursor() as cursor:
+            self._execute_prepared(conn, cursor, 'update_user_last_login_stmt', (user_id,))
+            conn.commit()
+            self._invalidate_user(user_id)
+            return cursor.rowcount > 0
+
+    @_db_op("Error updating password", default=False)
+    def update_user_password(self, conn, user_id: int, password_hash: str) -> bool:
         """Update user's password hash."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        UPDATE app_users
-                        SET password_hash = %s, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """, (password_hash, user_id))
-                    conn.commit()
-                    return cursor.rowcount > 0
-            except psycopg2.Error as e:
-                st.error(f"Error updating password: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
-
-    def get_all_users(self) -> List[Dict]:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE app_users
+                SET password_hash = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (password_hash, user_id))
+            conn.commit()
+            self._invalidate_user(user_id)
+            return cursor.rowcount > 0
+
+    @_db_op("Error fetching users", default=list, read_only=True)
+    def get_all_users(self, conn) -> List[Dict]:
         """Retrieve all active users from the database."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT id, username, email, display_name, is_active, created_at, last_login
-                        FROM app_users WHERE is_active = TRUE ORDER BY display_name
-                    """)
-                    users = cursor.fetchall()
-                    return [dict(user) for user in users]
-            except psycopg2.Error as e:
-                st.error(f"Error fetching users: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
-
-    def create_user(self, display_name: str, email: str) -> bool:
-        """Create a simple user record for PoC paths without auth fields."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        "INSERT INTO app_users (username, email, password_hash, display_name) VALUES (%s, %s, %s, %s)",
-                        (display_name.lower().replace(" ", "_"), email, "", display_name)
-                    )
-                    conn.commit()
-                    return True
-            except psycopg2.Error as e:
-                st.error(f"Error creating user: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_GET_ALL_USERS)
+            return [dict(zip(_USER_LIST_COLUMNS, row)) for row in cursor.fetchall()]
 
-    def save_note(self, user_id: int, content: str) -> bool:
+    @_db_op("Error creating user", default=False)
+    def create_user(self, conn, display_name: str, email: str) -> bool:
+        """Create a simple user record for PoC paths without auth fields."""
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO app_users (username, email, password_hash, display_name) VALUES (%s, %s, %s, %s)",
+                (_slugify(display_name), email, "", display_name)
+            )
+            return True
+
+    @_db_op("Error saving note", default=False)
+    def save_note(self, conn, user_id: int, content: str) -> bool:
         """Save a new note for a user."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        "INSERT INTO notes (user_id, content) VALUES (%s, %s)",
-                        (user_id, content)
-                    )
-                    conn.commit()
-                    return True
-            except psycopg2.Error as e:
-                st.error(f"Error saving note: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
-
-    def save_note_with_tag(self, user_id: int, content: str, note_date: str = None, tag_id: int = None) -> Optional[int]:
+        with conn.cursor() as cursor:
+            self._execute_prepared(conn, cursor, 'save_note_stmt', (user_id, content))
+            return True
+
+    def save_notes_bulk(self, user_id: int, contents: Iterable[str]) -> int:
+        """Insert many notes for a user in one COPY stream; returns the number of notes saved."""
+        # QUOTE_NONNUMERIC quotes every content field, so '' stays an empty string rather than NULL
+        buf = io.StringIO()
+        csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n').writerows(
+            (user_id, content) for content in contents
+        )
+        if not buf.tell():
+            return 0
+        buf.seek(0)
+        return self._copy_notes(buf)
+
+    @_db_op("Error saving notes", default=0)
+    def _copy_notes(self, conn, buf) -> int:
+        """COPY CSV (user_id, content) rows from buf into notes."""
+        with conn.cursor() as cursor:
+            cursor.copy_expert("COPY notes (user_id, content) FROM STDIN WITH (FORMAT csv)", buf)
+            return cursor.rowcount
+
+    @_db_op("Error saving notes", default=list)
+    def save_notes_with_tags_bulk(self, conn, user_id: int, rows: List[Tuple[str, Optional[str], Optional[int]]]) -> List[int]:
+        """Insert (content, note_date, tag_id) rows and their tag links in one statement.
+
+        Like save_note_with_tag, a missing note_date means today and a missing tag_id
+        means untagged. Returns the new note ids in input order.
+        """
+        if not rows:
+            return []
+        contents, note_dates, tag_ids = (list(column) for column in zip(*rows))
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_SAVE_NOTES_WITH_TAGS,
+                           (contents, note_dates, [tag_id or None for tag_id in tag_ids], user_id))
+            return [row[0] for row in cursor.fetchall()]
+
+    @_db_op("Error saving note with tag", default=None)
+    def save_note_with_tag(self, conn, user_id: int, content: str, note_date: str = None, tag_id: int = None) -> Optional[int]:
         """Save a new note with optional date and tag."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    # Insert the note
-                    if note_date:
-                        cursor.execute("""
-                            INSERT INTO notes (user_id, content, note_date)
-                            VALUES (%s, %s, %s)
-                            RETURNING id
-                        """, (user_id, content, note_date))
-                    else:
-                        cursor.execute("""
-                            INSERT INTO notes (user_id, content)
-                            VALUES (%s, %s)
-                            RETURNING id
-                        """, (user_id, content))
-
-                    note_id = cursor.fetchone()[0]
-
-                    # Add tag association if provided
-                    if tag_id:
-                        cursor.execute("""
-                            INSERT INTO note_tags (note_id, tag_id)
-                            VALUES (%s, %s)
-                        """, (note_id, tag_id))
-
-                    conn.commit()
-                    return note_id
-            except psycopg2.Error as e:
-                st.error(f"Error saving note with tag: {e}")
-                conn.rollback()
-                return None
-            finally:
-                conn.close()
-        return None
+        with conn.cursor() as cursor:
+            # Insert the note
+            if note_date:
+                cursor.execute("""
+                    INSERT INTO notes (user_id, content, note_date)
+                    VALUES (%s, %s, %s)
+                    RETURNING id
+                """, (user_id, content, note_date))
+            else:
+                cursor.execute("""
+                    INSERT INTO notes (user_id, content)
+                    VALUES (%s, %s)
+                    RETURNING id
+                """, (user_id, content))
+
+            note_id = cursor.fetchone()[0]
+
+            # Add tag association if provided
+            if tag_id:
+                cursor.execute("""
+                    INSERT INTO note_tags (note_id, tag_id)
+                    VALUES (%s, %s)
+                """, (note_id, tag_id))
+
+            return note_id
 
-    def get_weekly_notes(self, user_id: int) -> List[Dict]:
+    @_db_op("Error fetching weekly notes", default=list, read_only=True)
+    def get_weekly_notes(self, conn, user_id: int) -> List[Dict]:
         """Get notes for the current week for a specific user with tag information."""
         # Calculate the start of the current week (Monday)
         today = datetime.now().date()
@@ -444,476 +762,272 @@ class DatabaseManager:
         week_start = today - timedelta(days=days_since_monday)
         week_end = week_start + timedelta(days=6)
 
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT n.id, n.content, n.note_date, n.created_at,
-                               t.id as tag_id, t.name as tag_name, t.color as tag_color
-                        FROM notes n
-                        LEFT JOIN note_tags nt ON n.id = nt.note_id
-                        LEFT JOIN tags t ON nt.tag_id = t.id
-                        WHERE n.user_id = %s
-                        AND n.note_date BETWEEN %s AND %s
-                        ORDER BY n.note_date DESC, n.created_at DESC
-                    """, (user_id, week_start, week_end))
-                    rows = cursor.fetchall()
-
-                    # Group notes and their tags
-                    notes_dict = {}
-                    for row in rows:
-                        note_id = row['id']
-                        if note_id not in notes_dict:
-                            notes_dict[note_id] = {
-                                'id': row['id'],
-                                'content': row['content'],
-                                'note_date': row['note_date'],
-                                'created_at': row['created_at'],
-                                'tags': []
-                            }
-
-                        if row['tag_id']:
-                            notes_dict[note_id]['tags'].append({
-                                'id': row['tag_id'],
-                                'name': row['tag_name'],
-                                'color': row['tag_color']
-                            })
-
-                    return list(notes_dict.values())
-            except psycopg2.Error as e:
-                st.error(f"Error fetching weekly notes: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
-
-    def get_notes_with_tags(self, user_id: int, tag_id: int = None, limit: int = 50) -> List[Dict]:
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_NOTES_IN_RANGE, (user_id, week_start, week_end))
+            return _group_note_rows(cursor.fetchall())
+
+    @_db_op("Error fetching notes with tags", default=list, read_only=True)
+    def get_notes_with_tags(self, conn, user_id: int, tag_id: int = None, limit: int = 50) -> List[Dict]:
         """Get notes for a user, optionally filtered by tag."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    if tag_id:
-                        cursor.execute("""
-                            SELECT n.id, n.content, n.note_date, n.created_at,
-                                   t.id as tag_id, t.name as tag_name, t.color as tag_color
-                            FROM notes n
-                            INNER JOIN note_tags nt ON n.id = nt.note_id
-                            INNER JOIN tags t ON nt.tag_id = t.id
-                            WHERE n.user_id = %s AND t.id = %s
-                            ORDER BY n.note_date DESC, n.created_at DESC
-                            LIMIT %s
-                        """, (user_id, tag_id, limit))
-                    else:
-                        cursor.execute("""
-                            SELECT n.id, n.content, n.note_date, n.created_at,
-                                   t.id as tag_id, t.name as tag_name, t.color as tag_color
-                            FROM notes n
-                            LEFT JOIN note_tags nt ON n.id = nt.note_id
-                            LEFT JOIN tags t ON nt.tag_id = t.id
-                            WHERE n.user_id = %s
-                            ORDER BY n.note_date DESC, n.created_at DESC
-                            LIMIT %s
-                        """, (user_id, limit))
-
-                    rows = cursor.fetchall()
-
-                    # Group notes and their tags
-                    notes_dict = {}
-                    for row in rows:
-                        note_id = row['id']
-                        if note_id not in notes_dict:
-                            notes_dict[note_id] = {
-                                'id': row['id'],
-                                'content': row['content'],
-                                'note_date': row['note_date'],
-                                'created_at': row['created_at'],
-                                'tags': []
-                            }
-
-                        if row['tag_id']:
-                            notes_dict[note_id]['tags'].append({
-                                'id': row['tag_id'],
-                                'name': row['tag_name'],
-                                'color': row['tag_color']
-                            })
-
-                    return list(notes_dict.values())
-            except psycopg2.Error as e:
-                st.error(f"Error fetching notes with tags: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
-
-    def get_user_by_id(self, user_id: int) -> Optional[Dict]:
+        with conn.cursor() as cursor:
+            if tag_id:
+                cursor.execute(_SQL_NOTES_BY_TAG, (user_id, tag_id, limit))
+            else:
+                cursor.execute(_SQL_RECENT_NOTES, (user_id, limit))
+
+            return _group_note_rows(cursor.fetchall())
+
+    @_cached_lookup
+    @_db_op("Error fetching user", default=None, read_only=True)
+    def get_user_by_id(self, conn, user_id: int) -> Optional[Dict]:
         """Get a specific user by ID."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT id, username, email, display_name, is_active,
-                               created_at, updated_at, last_login
-                        FROM app_users WHERE id = %s AND is_active = TRUE
-                    """, (user_id,))
-                    user = cursor.fetchone()
-                    return dict(user) if user else None
-            except psycopg2.Error as e:
-                st.error(f"Error fetching user: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
+        with conn.cursor(cursor_factory=_pg().extras.RealDictCursor) as cursor:
+            cursor.execute(_SQL_GET_USER_BY_ID, (user_id,))
+            return cursor.fetchone()
 
-    def get_all_notes_for_user(self, user_id: int, limit: int = 50) -> List[Dict]:
+    @_db_op("Error fetching user notes", default=list, read_only=True)
+    def get_all_notes_for_user(self, conn, user_id: int, limit: int = 50) -> List[Dict]:
         """Get all notes for a user with optional limit, including tag information."""
-        conn = self.get_connection()
-        if conn:
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_RECENT_NOTES, (user_id, limit))
+            return _group_note_rows(cursor.fetchall())
+
+    def iter_notes_for_user(self, user_id: int, batch: int = 500) -> Iterator[Dict]:
+        """Yield every note of a user, newest first, without loading them all at once.
+
+        Rows stream from a server-side cursor `batch` at a time, so memory stays flat
+        for long histories. The connection is held until the iterator is exhausted
+        or closed.
+        """
+        with self._checkout() as conn:
+            if not conn:
+                return
             try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT n.id, n.content, n.note_date, n.created_at,
-                               t.id as tag_id, t.name as tag_name, t.color as tag_color
-                        FROM notes n
-                        LEFT JOIN note_tags nt ON n.id = nt.note_id
-                        LEFT JOIN tags t ON nt.tag_id = t.id
-                        WHERE n.user_id = %s
-                        ORDER BY n.note_date DESC, n.created_at DESC
-                        LIMIT %s
-                    """, (user_id, limit))
-                    rows = cursor.fetchall()
-
-                    # Group notes and their tags
-                    notes_dict = {}
-                    for row in rows:
-                        note_id = row['id']
-                        if note_id not in notes_dict:
-                            notes_dict[note_id] = {
-                                'id': row['id'],
-                                'content': row['content'],
-                                'note_date': row['note_date'],
-                                'created_at': row['created_at'],
-                                'tags': []
-                            }
-
-                        if row['tag_id']:
-                            notes_dict[note_id]['tags'].append({
-                                'id': row['tag_id'],
-                                'name': row['tag_name'],
-                                'color': row['tag_color']
-                            })
-
-                    return list(notes_dict.values())
-            except psycopg2.Error as e:
-                st.error(f"Error fetching user notes: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
+                # Named cursors live inside a transaction, so this can't use a read_only checkout
+                with conn, conn.cursor(name='notes_iter') as cursor:
+                    cursor.itersize = batch
+                    cursor.execute(_SQL_ALL_NOTES_FOR_USER, (user_id,))
+                    for row in cursor:
+                        yield dict(zip(_NOTE_COLUMNS, row))
+            except _pg().Error:
+                logger.exception("Error streaming user notes")
 
     def test_connection(self) -> bool:
         """Test the database connection."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute("SELECT 1")
-                    return True
-            except psycopg2.Error:
-                return False
-            finally:
-                conn.close()
+        with self._checkout(read_only=True) as conn:
+            if conn:
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                        return True
+                except _pg().Error:
+                    return False
         return False
 
-    def get_manager_info(self, user_id: int) -> Optional[Dict]:
+    @_db_op("Error fetching manager info", default=None, read_only=True)
+    def get_manager_info(self, conn, user_id: int) -> Optional[Dict]:
         """Get manager (boss) name and email for a user."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        """
-                        SELECT manager_name, manager_email
-                        FROM app_users
-                        WHERE id = %s AND is_active = TRUE
-                        """,
-                        (user_id,),
-                    )
-                    row = cursor.fetchone()
-                    return dict(row) if row else None
-            except psycopg2.Error as e:
-                st.error(f"Error fetching manager info: {e}")
-                return None
-            finally:
-                conn.close()
-        return None
-
-    def update_manager_info(self, user_id: int, manager_name: str, manager_email: str) -> bool:
+        with conn.cursor(cursor_factory=_pg().extras.RealDictCursor) as cursor:
+            cursor.execute(
+                """
+                SELECT manager_name, manager_email
+                FROM app_users
+                WHERE id = %s AND is_active = TRUE
+                """,
+                (user_id,),
+            )
+            return cursor.fetchone()
+
+    @_db_op("Error updating manager info", default=False)
+    def update_manager_info(self, conn, user_id: int, manager_name: str, manager_email: str) -> bool:
         """Update manager (boss) name and email for a user."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        UPDATE app_users
-                        SET manager_name = %s, manager_email = %s, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s AND is_active = TRUE
-                        """,
-                        (manager_name, manager_email, user_id),
-                    )
-                    conn.commit()
-                    return cursor.rowcount > 0
-            except psycopg2.Error as e:
-                st.error(f"Error updating manager info: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
-
-    def save_sent_email(self, user_id: int, to_email: str, subject: str, body: str, status: str = 'queued') -> Optional[int]:
-        """Persist an email send record and return its id."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO sent_emails (user_id, to_email, subject, body, status)
-                        VALUES (%s, %s, %s, %s, %s)
-                        RETURNING id
-                        """,
-                        (user_id, to_email, subject, body, status),
-                    )
-                    email_id = cursor.fetchone()[0]
-                    conn.commit()
-                    return email_id
-            except psycopg2.Error as e:
-                st.error(f"Error saving sent email record: {e}")
-                conn.rollback()
-                return None
-            finally:
-                conn.close()
-        return None
-
-    def update_sent_email_status(self, email_id: int, status: str, error_message: Optional[str] = None) -> bool:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE app_users
+                SET manager_name = %s, manager_email = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND is_active = TRUE
+                """,
+                (manager_name, manager_email, user_id),
+            )
+            return cursor.rowcount > 0
+
+    @_db_op("Error saving sent email record", default=None)
+    def save_sent_email(self, conn, user_id: int, to_email: str, subject: str, body: str, status: str = 'queued',
+                        error_message: Optional[str] = None) -> Optional[int]:
+        """Persist an email send record and return its id.
+
+        When the send outcome is already known (synchronous SMTP), pass the final
+        status and error here so the record is written once instead of insert + update.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO sent_emails (user_id, to_email, subject, body, status, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (user_id, to_email, subject, body, status, error_message),
+            )
+            return cursor.fetchone()[0]
+
+    @_db_op("Error saving sent email records", default=list)
+    def save_sent_emails_bulk(self, conn, user_id: int,
+                              rows: List[Tuple[str, str, str, str, Optional[str]]]) -> List[int]:
+        """Persist (to_email, subject, body, status, error_message) records in one statement.
+
+        Returns the new record ids in input order.
+        """
+        if not rows:
+            return []
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_SAVE_SENT_EMAILS, (*(list(column) for column in zip(*rows)), user_id))
+            return [row[0] for row in cursor.fetchall()]
+
+    @_db_op("Error updating sent email status", default=False)
+    def update_sent_email_status(self, conn, email_id: int, status: str, error_message: Optional[str] = None) -> bool:
         """Update status (and optional error) of a sent email record."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        UPDATE sent_emails
-                        SET status = %s,
-                            error_message = %s,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                        """,
-                        (status, error_message, email_id),
-                    )
-                    conn.commit()
-                    return cursor.rowcount > 0
-            except psycopg2.Error as e:
-                st.error(f"Error updating sent email status: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE sent_emails
+                SET status = %s,
+                    error_message = %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+                """,
+                (status, error_message, email_id),
+            )
+            return cursor.rowcount > 0
 
     # Tag management methods
-    def get_user_tags(self, user_id: int) -> List[Dict]:
+    @_cached_lookup
+    @_db_op("Error fetching user tags", default=list, read_only=True)
+    def get_user_tags(self, conn, user_id: int) -> List[Dict]:
         """Get all tags for a specific user."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT id, name, color, created_at
-                        FROM tags
-                        WHERE user_id = %s
-                        ORDER BY name
-                    """, (user_id,))
-                    tags = cursor.fetchall()
-                    return [dict(tag) for tag in tags]
-            except psycopg2.Error as e:
-                st.error(f"Error fetching user tags: {e}")
-                return []
-            finally:
-                conn.close()
-        return []
-
-    def create_tag(self, user_id: int, name: str, color: str = '#1f77b4') -> Optional[int]:
-        """Create a new tag for a user."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        INSERT INTO tags (user_id, name, color)
-                        VALUES (%s, %s, %s)
-                        RETURNING id
-                    """, (user_id, name.strip(), color))
-                    tag_id = cursor.fetchone()[0]
-                    conn.commit()
-                    return tag_id
-            except psycopg2.IntegrityError:
-                # Tag name already exists for this user
-                conn.rollback()
-                return None
-            except psycopg2.Error as e:
-                st.error(f"Error creating tag: {e}")
-                conn.rollback()
-                return None
-            finally:
-                conn.close()
-        return None
+        with conn.cursor() as cursor:
+            self._execute_prepared(conn, cursor, 'get_user_tags_stmt', (user_id,))
+            return [dict(zip(_TAG_COLUMNS, row)) for row in cursor.fetchall()]
 
-    def delete_tag(self, user_id: int, tag_id: int) -> bool:
+    @_db_op("Error creating tag", default=None)
+    def create_tag(self, conn, user_id: int, name: str, color: str = '#1f77b4') -> Optional[int]:
+        """Create a new tag for a user."""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO tags (user_id, name, color)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (user_id, name) DO NOTHING
+                RETURNING id
+            """, (user_id, name.strip(), color))
+            row = cursor.fetchone()
+            if not row:
+                return None  # Tag name already exists for this user
+            conn.commit()
+            self._invalidate_tags(user_id)
+            return row[0]
+
+    @_db_op("Error deleting tag", default=False)
+    def delete_tag(self, conn, user_id: int, tag_id: int) -> bool:
         """Delete a tag (only if it belongs to the user)."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        DELETE FROM tags
-                        WHERE id = %s AND user_id = %s
-                    """, (tag_id, user_id))
-                    conn.commit()
-                    return cursor.rowcount > 0
-            except psycopg2.Error as e:
-                st.error(f"Error deleting tag: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM tags
+                WHERE id = %s AND user_id = %s
+            """, (tag_id, user_id))
+            conn.commit()
+            self._invalidate_tags(user_id)
+            return cursor.rowcount > 0
+
+    @_db_op("Error creating tags", default=list)
+    def create_tags_bulk(self, conn, user_id: int, tags: List[Tuple[str, str]]) -> List[int]:
+        """Create several (name, color) tags for a user in one statement.
+
+        Names that already exist for the user are skipped; returns the ids of the
+        tags that were actually created.
+        """
+        if not tags:
+            return []
+        with conn.cursor() as cursor:
+            rows = _pg().extras.execute_values(
+                cursor,
+                """
+                INSERT INTO tags (user_id, name, color)
+                VALUES %s
+                ON CONFLICT (user_id, name) DO NOTHING
+                RETURNING id
+                """,
+                [(user_id, name.strip(), color) for name, color in tags],
+                # One page, so any number of tags is a single INSERT
+                page_size=len(tags),
+                fetch=True
+            )
+            conn.commit()
+            self._invalidate_tags(user_id)
+            return [row[0] for row in rows]
 
     def create_default_tags(self, user_id: int) -> bool:
         """Create default tags for a new user."""
-        default_tags = [
-            {"name": "Professional", "color": "#1f77b4"},
-            {"name": "Personal", "color": "#ff7f0e"},
-            {"name": "Learning", "color": "#2ca02c"}
-        ]
+        return bool(self.create_tags_bulk(user_id, self.DEFAULT_TAGS))
 
-        success_count = 0
-        for tag_data in default_tags:
-            tag_id = self.create_tag(user_id, tag_data["name"], tag_data["color"])
-            if tag_id:
-                success_count += 1
+    @_db_op("Error updating note", default=False)
+    def update_note_with_tag(self, conn, note_id: int, user_id: int, content: str = None, note_date: str = None, tag_id: int = None) -> bool:
+        """Update an existing note with new content, date, and/or tag.
 
-        return success_count > 0
-
-    def update_note_with_tag(self, note_id: int, user_id: int, content: str = None, note_date: str = None, tag_id: int = None) -> bool:
-        """Update an existing note with new content, date, and/or tag."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor() as cursor:
-                    # First verify the note belongs to the user
-                    cursor.execute("""
-                        SELECT id FROM notes WHERE id = %s AND user_id = %s
-                    """, (note_id, user_id))
-
-                    if not cursor.fetchone():
-                        return False  # Note doesn't exist or doesn't belong to user
-
-                    # Update note content and/or date if provided
-                    update_parts = []
-                    update_values = []
-
-                    if content is not None:
-                        update_parts.append("content = %s")
-                        update_values.append(content)
-
-                    if note_date is not None:
-                        update_parts.append("note_date = %s")
-                        update_values.append(note_date)
-
-                    if update_parts:
-                        update_values.extend([note_id, user_id])
-                        cursor.execute(f"""
-                            UPDATE notes
-                            SET {', '.join(update_parts)}
-                            WHERE id = %s AND user_id = %s
-                        """, update_values)
-
-                    # Handle tag association
-                    if tag_id is not None:
-                        # Remove existing tag associations for this note
-                        cursor.execute("""
-                            DELETE FROM note_tags WHERE note_id = %s
-                        """, (note_id,))
-
-                        # Add new tag association if tag_id > 0
-                        if tag_id > 0:
-                            cursor.execute("""
-                                INSERT INTO note_tags (note_id, tag_id)
-                                VALUES (%s, %s)
-                                ON CONFLICT (note_id, tag_id) DO NOTHING
-                            """, (note_id, tag_id))
-
-                    conn.commit()
-                    return True
-
-            except psycopg2.Error as e:
-                st.error(f"Error updating note: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
-        return False
-
-    def get_note_by_id(self, note_id: int, user_id: int) -> Optional[Dict]:
+        Ownership check, note update and tag replacement run as one statement:
+        None leaves a field unchanged, tag_id=0 removes the note's tags and a
+        positive tag_id replaces them with that tag.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                WITH upd AS (
+                    UPDATE notes
+                    SET content = COALESCE(%(content)s, content),
+                        note_date = COALESCE(%(note_date)s, note_date)
+                    WHERE id = %(note_id)s AND user_id = %(user_id)s
+                    RETURNING id
+                ),
+                del AS (
+                    DELETE FROM note_tags
+                    WHERE note_id IN (SELECT id FROM upd)
+                    AND %(tag_id)s IS NOT NULL AND tag_id <> %(tag_id)s
+                ),
+                ins AS (
+                    INSERT INTO note_tags (note_id, tag_id)
+                    SELECT id, %(tag_id)s FROM upd WHERE %(tag_id)s > 0
+                    ON CONFLICT (note_id, tag_id) DO NOTHING
+                )
+                SELECT id FROM upd
+            """, {
+                'note_id': note_id,
+                'user_id': user_id,
+                'content': content,
+                'note_date': note_date,
+                'tag_id': tag_id,
+            })
+
+            if not cursor.fetchone():
+                return False  # Note doesn't exist or doesn't belong to user
+
+            return True
+
+    @_db_op("Error fetching note", default=None, read_only=True)
+    def get_note_by_id(self, conn, note_id: int, user_id: int) -> Optional[Dict]:
         """Get a specific note by ID (only if it belongs to the user)."""
-        conn = self.get_connection()
-        if conn:
-            try:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute("""
-                        SELECT n.id, n.content, n.note_date, n.created_at,
-                               t.id as tag_id, t.name as tag_name, t.color as tag_color
-                        FROM notes n
-                        LEFT JOIN note_tags nt ON n.id = nt.note_id
-                        LEFT JOIN tags t ON nt.tag_id = t.id
-                        WHERE n.id = %s AND n.user_id = %s
-                    """, (note_id, user_id))
-
-                    rows = cursor.fetchall()
-                    if not rows:
-                        return None
-
-                    # Build note with tags
-                    note = {
-                        'id': rows[0]['id'],
-                        'content': rows[0]['content'],
-                        'note_date': rows[0]['note_date'],
-                        'created_at': rows[0]['created_at'],
-                        'tags': []
-                    }
-
-                    for row in rows:
-                        if row['tag_id']:
-                            note['tags'].append({
-                                'id': row['tag_id'],
-                                'name': row['tag_name'],
-                                'color': row['tag_color']
-                            })
-
-                    return note
-
-            except psycopg2.Error as e:
-                st.error(f"Error fetching note: {e}")
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_NOTES_BY_IDS, (user_id, [note_id]))
+            row = cursor.fetchone()
+            if not row:
                 return None
-            finally:
-                conn.close()
-        return None
-
+            return dict(zip(_NOTE_COLUMNS, row))
+
+    @_db_op("Error fetching notes", default=list, read_only=True)
+    def get_notes_by_ids(self, conn, user_id: int, note_ids: List[int]) -> List[Dict]:
+        """Get several notes by ID in one query, skipping any that don't belong to the user."""
+        if not note_ids:
+            return []
+        with conn.cursor() as cursor:
+            cursor.execute(_SQL_NOTES_BY_IDS, (user_id, list(note_ids)))
+            return [dict(zip(_NOTE_COLUMNS, row)) for row in cursor.fetchall()]
 
 
 # Global database manager instance
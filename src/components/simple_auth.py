@@ -2,12 +2,62 @@
 Simple authentication system for the Daily Notes application.
 Uses Streamlit session state and bcrypt for password hashing.
 """
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import streamlit as st
 import bcrypt
 from typing import Optional, Dict
-import toml
-import os
 from .database import db_manager
+from src.utils.secrets import load_secrets_from_toml
+
+logger = logging.getLogger(__name__)
+
+# bcrypt>=4 hashes in its compiled Rust extension; anything else (an old or shadowing
+# pure-Python package) makes every login and registration several times slower.
+if not hasattr(bcrypt, '_bcrypt'):
+    logger.warning("bcrypt native backend not loaded (bcrypt %s); password hashing will be slow",
+                   getattr(bcrypt, '__version__', 'unknown'))
+
+DEFAULT_AUTH_CONFIG = {
+    'session_timeout': 3600,
+    'password_min_length': 6,
+    'require_email_verification': False,
+    'bcrypt_rounds': 12
+}
+
+# bcrypt cost bounds for BCRYPT_ROUNDS = "auto". Each round doubles hashing time:
+# lower is faster to register/login but cheaper to brute-force if hashes leak.
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 14
+BCRYPT_TARGET_SECONDS = 0.25
+
+# bcrypt releases the GIL while hashing, so logins from different Streamlit sessions
+# already run in parallel; this pool caps them at one per core so a burst queues
+# instead of oversubscribing the CPU and slowing every login down together.
+_BCRYPT_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='bcrypt')
+
+
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+
+def _bcrypt_input(password: str) -> bytes:
+    """UTF-8 encode a password, keeping only the bytes bcrypt actually uses.
+
+    Every character encodes to at least one byte, so slicing the string first bounds
+    the work for arbitrarily long input without changing the resulting bytes.
+    """
+    return password[:BCRYPT_MAX_PASSWORD_BYTES].encode('utf-8')[:BCRYPT_MAX_PASSWORD_BYTES]
+
+
+@lru_cache(maxsize=4)
+def _dummy_hash(rounds: int) -> str:
+    """A throwaway hash at the given cost, checked when a login names no known user."""
+    return bcrypt.hashpw(b'not-a-user', bcrypt.gensalt(rounds=rounds)).decode('ascii')
 
 
 class SimpleAuthService:
@@ -16,56 +66,73 @@ class SimpleAuthService:
     def __init__(self):
         """Initialize the authentication service."""
         self.config = self._load_auth_config()
+        if self.config['bcrypt_rounds'] == 'auto':
+            self._auto_calibrate()
+        # Compute the unknown-user hash in the background instead of on the first failed login
+        _BCRYPT_POOL.submit(_dummy_hash, self.config['bcrypt_rounds'])
     
     def _load_auth_config(self) -> Dict:
         """Load authentication configuration from secrets."""
         try:
-            # Try to load from Streamlit secrets first
-            if hasattr(st, 'secrets') and 'auth' in st.secrets:
+            # Try Streamlit secrets first; raises when there is no secrets file or [auth] section
+            try:
+                auth_config = st.secrets['auth']
+            except Exception:
+                auth_config = None
+
+            # Fallback to secrets.toml directly (parsed once per file version)
+            if auth_config is None:
+                auth_config = (load_secrets_from_toml() or {}).get('auth')
+
+            if auth_config:
                 return {
-                    'session_timeout': int(st.secrets.auth.get('SESSION_TIMEOUT', 3600)),
-                    'password_min_length': int(st.secrets.auth.get('PASSWORD_MIN_LENGTH', 6)),
-                    'require_email_verification': st.secrets.auth.get('REQUIRE_EMAIL_VERIFICATION', 'false').lower() == 'true'
+                    'session_timeout': int(auth_config.get('SESSION_TIMEOUT', 3600)),
+                    'password_min_length': int(auth_config.get('PASSWORD_MIN_LENGTH', 6)),
+                    'require_email_verification': str(auth_config.get('REQUIRE_EMAIL_VERIFICATION', 'false')).lower() == 'true',
+                    'bcrypt_rounds': self._parse_bcrypt_rounds(auth_config.get('BCRYPT_ROUNDS', 12))
                 }
-            
-            # Fallback to loading from secrets.toml file directly
-            secrets_path = os.path.join('.streamlit', 'secrets.toml')
-            if os.path.exists(secrets_path):
-                with open(secrets_path, 'r') as f:
-                    secrets = toml.load(f)
-                    if 'auth' in secrets:
-                        auth_config = secrets['auth']
-                        return {
-                            'session_timeout': int(auth_config.get('SESSION_TIMEOUT', 3600)),
-                            'password_min_length': int(auth_config.get('PASSWORD_MIN_LENGTH', 6)),
-                            'require_email_verification': auth_config.get('REQUIRE_EMAIL_VERIFICATION', 'false').lower() == 'true'
-                        }
-            
-            # Default configuration
-            return {
-                'session_timeout': 3600,
-                'password_min_length': 6,
-                'require_email_verification': False
-            }
-            
+
         except Exception as e:
             print(f"Error loading auth config: {e}")
-            return {
-                'session_timeout': 3600,
-                'password_min_length': 6,
-                'require_email_verification': False
-            }
+
+        # Default configuration
+        return dict(DEFAULT_AUTH_CONFIG)
     
+    @staticmethod
+    def _parse_bcrypt_rounds(value):
+        """BCRYPT_ROUNDS is an integer cost or "auto" to calibrate on startup."""
+        if str(value).strip().lower() == 'auto':
+            return 'auto'
+        return int(value)
+
+    def _auto_calibrate(self, target_seconds: float = BCRYPT_TARGET_SECONDS) -> int:
+        """Pick the highest bcrypt cost whose hash stays under target_seconds on this host.
+
+        One hash is timed at BCRYPT_MIN_ROUNDS and doubled per extra round. Existing
+        hashes keep verifying, since bcrypt stores the cost inside each hash.
+        """
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=BCRYPT_MIN_ROUNDS))
+        elapsed = time.perf_counter() - start
+
+        rounds = BCRYPT_MIN_ROUNDS
+        while rounds < BCRYPT_MAX_ROUNDS and elapsed * 2 <= target_seconds:
+            elapsed *= 2
+            rounds += 1
+        self.config['bcrypt_rounds'] = rounds
+        return rounds
+
     def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt."""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
+        """Hash a password using bcrypt at the configured cost."""
+        salt = bcrypt.gensalt(rounds=self.config['bcrypt_rounds'])
+        hashed = _BCRYPT_POOL.submit(bcrypt.hashpw, _bcrypt_input(password), salt).result()
+        return hashed.decode('ascii')
     
     def verify_password(self, password: str, hashed: str) -> bool:
         """Verify a password against its hash."""
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+            # bcrypt hashes are plain ASCII; only the user's password needs UTF-8
+            return _BCRYPT_POOL.submit(bcrypt.checkpw, _bcrypt_input(password), hashed.encode('ascii')).result()
         except Exception:
             return False
     
@@ -75,7 +142,8 @@ class SimpleAuthService:
             return False, f"Password must be at least {self.config['password_min_length']} characters long"
         
         # Add more validation rules as needed
-        if len(password.strip()) != len(password):
+        # Check the end characters rather than comparing against a stripped copy
+        if password and (password[0].isspace() or password[-1].isspace()):
             return False, "Password cannot start or end with spaces"
         
         return True, ""
@@ -94,32 +162,27 @@ class SimpleAuthService:
                 st.error(error_msg)
                 return None
             
-            # Check if user already exists
-            existing_user = db_manager.get_user_by_username(username)
-            if existing_user:
-                st.error("Username already exists")
-                return None
-            
-            existing_email = db_manager.get_user_by_email(email)
-            if existing_email:
-                st.error("Email already registered")
-                return None
-            
             # Hash password
             hashed_password = self.hash_password(password)
             
-            # Create user in database
-            user_id = db_manager.create_user_with_auth(
+            # Create user and their default tags in one transaction; the unique
+            # constraints report an existing username or email
+            user, conflict = db_manager.create_user_atomic(
                 username=username,
                 email=email,
                 password_hash=hashed_password,
                 display_name=display_name or username
             )
             
-            if user_id:
-                user = db_manager.get_user_by_id(user_id)
+            if user:
                 st.success("Account created successfully! You can now login.")
                 return user
+            elif conflict == 'username':
+                st.error("Username already exists")
+                return None
+            elif conflict == 'email':
+                st.error("Email already registered")
+                return None
             else:
                 st.error("Failed to create account. Please try again.")
                 return None
@@ -137,12 +200,11 @@ class SimpleAuthService:
             
             # Get user from database
             user = db_manager.get_user_by_username(username)
-            if not user:
-                st.error("Invalid username or password")
-                return None
             
-            # Verify password
-            if not self.verify_password(password, user['password_hash']):
+            # Verify password; unknown usernames still pay one bcrypt check so the
+            # response time does not reveal which usernames exist
+            stored_hash = user['password_hash'] if user else _dummy_hash(self.config['bcrypt_rounds'])
+            if not self.verify_password(password, stored_hash) or not user:
                 st.error("Invalid username or password")
                 return None
             
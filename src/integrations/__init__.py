@@ -1,2 +1,2 @@
-from .email_sender import send_email, EmailSendError
+from .email_sender import send_email, send_email_batch, EmailSendError, EmailSender
 
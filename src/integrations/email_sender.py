@@ -4,6 +4,12 @@ Simple SMTP email sender utility.
 - Reads SMTP settings from Streamlit secrets or local .streamlit/secrets.toml
 - Uses only Python standard library (smtplib + email.mime)
 - Provides send_email(to_address, subject, body) -> bool
+- Provides send_email_batch(to_addresses, subject, body) -> int for one email to many
+- EmailSender keeps one SMTP session open for sending several emails:
+
+    with EmailSender() as sender:
+        for address in recipients:
+            sender.send(address, subject, body)
 
 Expected secrets.toml structure:
 
@@ -23,33 +29,17 @@ If neither TLS nor SSL is true, a plain (insecure) SMTP connection will be used.
 """
 from __future__ import annotations
 
+import ipaddress
 import os
 import smtplib
-from typing import Dict, Optional
+import socket
+import time
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
 from email.mime.text import MIMEText
 
-# Streamlit is optional so this can be reused in tests/CLI
-try:
-    import streamlit as st  # type: ignore
-except Exception:  # pragma: no cover
-    st = None  # type: ignore
-
-try:
-    import toml  # type: ignore
-except Exception:  # pragma: no cover
-    toml = None  # type: ignore
-
-
-def _load_secrets_from_file() -> Optional[Dict]:
-    """Load .streamlit/secrets.toml if present."""
-    path = os.path.join(".streamlit", "secrets.toml")
-    if os.path.exists(path) and toml is not None:
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return toml.load(f)
-        except Exception:
-            return None
-    return None
+from src.utils.secrets import load_secrets
 
 
 essential_keys = {"HOST", "PORT"}
@@ -57,50 +47,32 @@ essential_keys = {"HOST", "PORT"}
 
 def get_smtp_config() -> Optional[Dict]:
     """Resolve SMTP config from Streamlit secrets or local secrets.toml or env vars."""
-    # 1) Streamlit secrets
-    if st is not None and hasattr(st, "secrets"):
-        try:
-            smtp = st.secrets.get("smtp")  # type: ignore[attr-defined]
-            if isinstance(smtp, dict) and smtp.get("HOST") and smtp.get("PORT"):
-                return {
-                    "HOST": smtp.get("HOST"),
-                    "PORT": int(smtp.get("PORT")),
-                    "USER": smtp.get("USER"),
-                    "PASSWORD": smtp.get("PASSWORD"),
-                    "FROM": smtp.get("FROM"),
-                    "USE_TLS": bool(smtp.get("USE_TLS", True)),
-                    "USE_SSL": bool(smtp.get("USE_SSL", False)),
-                }
-        except Exception:
-            pass
-
-    # 2) Local secrets.toml
-    secrets = _load_secrets_from_file()
-    if isinstance(secrets, dict):
-        smtp = secrets.get("smtp")
-        if isinstance(smtp, dict) and smtp.get("HOST") and smtp.get("PORT"):
+    # 1) [smtp] section from Streamlit secrets or the local secrets.toml; the
+    #    whole section comes from the first source that defines HOST and PORT
+    for source in load_secrets().maps:
+        if source.get("smtp.HOST") and source.get("smtp.PORT"):
             return {
-                "HOST": smtp.get("HOST"),
-                "PORT": int(smtp.get("PORT")),
-                "USER": smtp.get("USER"),
-                "PASSWORD": smtp.get("PASSWORD"),
-                "FROM": smtp.get("FROM"),
-                "USE_TLS": bool(smtp.get("USE_TLS", True)),
-                "USE_SSL": bool(smtp.get("USE_SSL", False)),
+                "HOST": source.get("smtp.HOST"),
+                "PORT": int(source.get("smtp.PORT")),
+                "USER": source.get("smtp.USER"),
+                "PASSWORD": source.get("smtp.PASSWORD"),
+                "FROM": source.get("smtp.FROM"),
+                "USE_TLS": bool(source.get("smtp.USE_TLS", True)),
+                "USE_SSL": bool(source.get("smtp.USE_SSL", False)),
             }
 
-    # 3) Environment variables (fallback)
-    host = os.getenv("SMTP_HOST")
-    port = os.getenv("SMTP_PORT")
+    # 2) Environment variables (fallback)
+    host = os.environ.get("SMTP_HOST")
+    port = os.environ.get("SMTP_PORT")
     if host and port:
         return {
             "HOST": host,
             "PORT": int(port),
-            "USER": os.getenv("SMTP_USER"),
-            "PASSWORD": os.getenv("SMTP_PASSWORD"),
-            "FROM": os.getenv("SMTP_FROM"),
-            "USE_TLS": os.getenv("SMTP_USE_TLS", "true").lower() == "true",
-            "USE_SSL": os.getenv("SMTP_USE_SSL", "false").lower() == "true",
+            "USER": os.environ.get("SMTP_USER"),
+            "PASSWORD": os.environ.get("SMTP_PASSWORD"),
+            "FROM": os.environ.get("SMTP_FROM"),
+            "USE_TLS": os.environ.get("SMTP_USE_TLS", "true").lower() == "true",
+            "USE_SSL": os.environ.get("SMTP_USE_SSL", "false").lower() == "true",
         }
 
     return None
@@ -110,57 +82,179 @@ class EmailSendError(Exception):
     pass
 
 
-def send_email(to_address: str, subject: str, body: str) -> bool:
-    """Send a plain-text email via SMTP using configuration from secrets.
+# SMTP host -> (expires_at, address). Saves a DNS lookup per connection when sending batches.
+DNS_CACHE_TTL_SECONDS = 300
+_DNS_CACHE: Dict[str, Tuple[float, str]] = {}
 
-    Returns True on success, False on failure.
-    Raises EmailSendError for configuration or connection errors.
+
+def _resolve_host(host: str, port: int) -> str:
+    """Return a cached address for host, resolving it on a miss; host itself if lookup fails."""
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    now = time.monotonic()
+    cached = _DNS_CACHE.get(host)
+    if cached and cached[0] > now:
+        return cached[1]
+    try:
+        address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+    except OSError:
+        # Let the connect itself resolve (and report) the name
+        return host
+    _DNS_CACHE[host] = (now + DNS_CACHE_TTL_SECONDS, address)
+    return address
+
+
+class _PinnedAddressMixin:
+    """Connect to the cached address of the SMTP host.
+
+    Only the socket target changes: smtplib keeps the hostname in self._host, which is
+    what STARTTLS and SMTP_SSL send as SNI and check the certificate against.
+    """
+
+    def _get_socket(self, host, port, timeout):
+        address = _resolve_host(host, port)
+        try:
+            return super()._get_socket(address, port, timeout)
+        except OSError:
+            if address == host:
+                raise
+            # The cached address may be stale; retry once with a fresh lookup
+            _DNS_CACHE.pop(host, None)
+            return super()._get_socket(host, port, timeout)
+
+
+@lru_cache(maxsize=None)
+def _pinned(smtp_class):
+    """smtp_class with DNS pinning mixed in (SMTP and SMTP_SSL)."""
+    return type(smtp_class.__name__, (_PinnedAddressMixin, smtp_class), {})
+
+
+class EmailSender:
+    """One SMTP session (connect, STARTTLS, login) reused for every message sent through it.
+
+    The connection is opened on the first send, so an invalid first recipient does not
+    cost a handshake, and closed when the context exits.
     """
-    cfg = get_smtp_config()
-    if not cfg:
-        raise EmailSendError("Missing SMTP configuration. Add [smtp] section to .streamlit/secrets.toml.")
 
+    def __init__(self, cfg: Optional[Dict] = None):
+        cfg = cfg or get_smtp_config()
+        if not cfg:
+            raise EmailSendError("Missing SMTP configuration. Add [smtp] section to .streamlit/secrets.toml.")
+        self.cfg = cfg
+        self.from_address = (cfg.get("FROM") or cfg.get("USER") or "no-reply@example.com").strip()
+        self._stack = ExitStack()
+        self._server = None
+
+    def __enter__(self) -> "EmailSender":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self) -> None:
+        """Quit the SMTP session if one is open."""
+        self._server = None
+        try:
+            self._stack.close()
+        except Exception:  # pragma: no cover
+            # The messages are already accepted; a failed QUIT is not worth surfacing
+            pass
+
+    def _connect(self):
+        cfg = self.cfg
+        host = cfg["HOST"]
+        port = int(cfg["PORT"])  # type: ignore[arg-type]
+        user = cfg.get("USER")
+        password = cfg.get("PASSWORD")
+        use_tls = bool(cfg.get("USE_TLS", True))
+        use_ssl = bool(cfg.get("USE_SSL", False))
+
+        smtp_class = smtplib.SMTP_SSL if use_ssl else smtplib.SMTP
+        server = _pinned(smtp_class)(host, port, timeout=15)
+        server = self._stack.enter_context(server)
+
+        server.ehlo()
+        if use_tls and not use_ssl:
+            try:
+                server.starttls()
+                server.ehlo()
+            except smtplib.SMTPNotSupportedError:
+                # Continue without TLS if unsupported
+                pass
+
+        if user and password:
+            server.login(user, password)
+        return server
+
+    def _message(self, subject: str, body: str) -> MIMEText:
+        """Build the encoded message without a recipient."""
+        msg = MIMEText(body or "", _subtype="plain", _charset="utf-8")
+        msg["Subject"] = subject or "Weekly Update"
+        msg["From"] = self.from_address
+        return msg
+
+    def _deliver(self, msg: MIMEText) -> None:
+        try:
+            if self._server is None:
+                self._server = self._connect()
+            self._server.send_message(msg)
+        except Exception as e:  # pragma: no cover
+            # Drop the session so a later send reconnects, and re-raise a clean error for the UI
+            self.close()
+            raise EmailSendError(str(e))
+
+    def send(self, to_address: str, subject: str, body: str) -> bool:
+        """Send one plain-text email over the shared session.
+
+        Returns True on success; raises EmailSendError for invalid input or SMTP errors.
+        """
+        msg = self._message(subject, body)
+        msg["To"] = _valid_recipient(to_address)
+        self._deliver(msg)
+        return True
+
+    def send_many(self, to_addresses: Iterable[str], subject: str, body: str) -> int:
+        """Send the same email to each address as its own message; returns the number sent.
+
+        The body is encoded once and only the To header changes per recipient. All
+        addresses are checked before anything is sent.
+        """
+        recipients = [_valid_recipient(address) for address in to_addresses]
+        msg = self._message(subject, body)
+        for address in recipients:
+            del msg["To"]
+            msg["To"] = address
+            self._deliver(msg)
+        return len(recipients)
+
+
+def _valid_recipient(to_address: str) -> str:
+    """Return the trimmed address, or raise EmailSendError if it is not one."""
     to_address = (to_address or "").strip()
     if not to_address or "@" not in to_address:
         raise EmailSendError("Invalid recipient email address.")
+    return to_address
 
-    subject = subject or "Weekly Update"
-    from_address = (cfg.get("FROM") or cfg.get("USER") or "no-reply@example.com").strip()
 
-    msg = MIMEText(body or "", _subtype="plain", _charset="utf-8")
-    msg["Subject"] = subject
-    msg["From"] = from_address
-    msg["To"] = to_address
+def send_email(to_address: str, subject: str, body: str) -> bool:
+    """Send a plain-text email via SMTP using configuration from secrets.
 
-    host = cfg["HOST"]
-    port = int(cfg["PORT"])  # type: ignore[arg-type]
-    user = cfg.get("USER")
-    password = cfg.get("PASSWORD")
-    use_tls = bool(cfg.get("USE_TLS", True))
-    use_ssl = bool(cfg.get("USE_SSL", False))
+    Returns True on success, False on failure.
+    Raises EmailSendError for configuration or connection errors.
+    """
+    with EmailSender() as sender:
+        return sender.send(to_address, subject, body)
 
-    try:
-        if use_ssl:
-            server = smtplib.SMTP_SSL(host, port, timeout=15)
-        else:
-            server = smtplib.SMTP(host, port, timeout=15)
-
-        with server:
-            server.ehlo()
-            if use_tls and not use_ssl:
-                try:
-                    server.starttls()
-                    server.ehlo()
-                except smtplib.SMTPNotSupportedError:
-                    # Continue without TLS if unsupported
-                    pass
-
-            if user and password:
-                server.login(user, password)
-
-            server.send_message(msg)
-        return True
-    except Exception as e:  # pragma: no cover
-        # Re-raise a clean error for the UI
-        raise EmailSendError(str(e))
 
+def send_email_batch(to_addresses: Iterable[str], subject: str, body: str) -> int:
+    """Send the same plain-text email to several recipients over one SMTP session.
+
+    Returns the number of emails sent.
+    Raises EmailSendError for configuration, recipient or connection errors.
+    """
+    with EmailSender() as sender:
+        return sender.send_many(to_addresses, subject, body)
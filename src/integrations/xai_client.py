@@ -3,24 +3,20 @@ xAI (Grok) API client helper for drafting a weekly performance email.
 
 - Reads API key from Streamlit secrets or local .streamlit/secrets.toml, with env fallback
 - Calls xAI chat completions endpoint using the OpenAI-compatible interface
-- Avoids non-standard dependencies; uses Python stdlib for HTTP
+- Sends requests over a shared, kept-alive requests.Session; falls back to stdlib urllib
+  when requests is not installed
+- Uses orjson for JSON when available, otherwise the stdlib json module
 """
 from __future__ import annotations
 
 import json
-import os
-from datetime import datetime
-from typing import Dict, List, Optional
-
-import streamlit as st
-
-try:
-    import toml  # type: ignore
-except Exception:  # pragma: no cover - toml is in requirements.txt
-    toml = None  # type: ignore
+from datetime import date
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 try:
     import requests  # type: ignore
+    import requests.adapters  # type: ignore
     _HAS_REQUESTS = True
 except Exception:  # pragma: no cover - requests may be available transitively
     requests = None  # type: ignore
@@ -29,21 +25,48 @@ except Exception:  # pragma: no cover - requests may be available transitively
 import urllib.request
 import urllib.error
 
+# orjson is optional; it parses and serializes the small request/response bodies
+# (and every streamed SSE event) several times faster than the stdlib
+try:
+    import orjson  # type: ignore
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - stdlib fallback
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    _json_loads = json.loads
+
 from src.prompts.weekly import weekly_email_messages
+from src.utils.secrets import load_secrets
 
 XAI_API_BASE = "https://api.x.ai/v1"
 DEFAULT_MODEL = "grok-3-mini"
 
+# Prompt budget: long notes are trimmed and very busy weeks are cut off
+NOTE_SNIPPET_MAX_CHARS = 400
+PROMPT_MAX_NOTES = 50
 
-def _load_secrets_from_file() -> Optional[Dict]:
-    secrets_path = os.path.join(".streamlit", "secrets.toml")
-    if os.path.exists(secrets_path) and toml is not None:
-        try:
-            with open(secrets_path, "r", encoding="utf-8") as f:
-                return toml.load(f)
-        except Exception:
-            return None
-    return None
+# Sent with every request; some CDNs block default Python clients without a UA (1010/1020)
+_DEFAULT_HEADERS = {
+    "User-Agent": "performance-emailer/1.0 (+https://localhost) Python-requests",
+    "Accept": "application/json",
+}
+
+
+def _build_session():
+    """Create the shared HTTP session so drafts reuse kept-alive TLS connections to xAI."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    session.headers.update(_DEFAULT_HEADERS)
+    return session
+
+
+_SESSION = _build_session() if _HAS_REQUESTS else None
+
+
+# Key names accepted within each secrets source, most specific first
+_XAI_KEY_NAMES = ("xai.API_KEY", "xai.XAI_API_KEY", "XAI_API_KEY")
 
 
 def get_xai_api_key() -> Optional[str]:
@@ -54,65 +77,182 @@ def get_xai_api_key() -> Optional[str]:
     2) .streamlit/secrets.toml under [xai].API_KEY or XAI_API_KEY
     3) environment variable XAI_API_KEY
     """
-    # 1. Streamlit secrets
+    # Check source by source: any key in st.secrets beats every key in the file
+    for source in load_secrets().maps:
+        for key in _XAI_KEY_NAMES:
+            if source.get(key):
+                return source[key]
+    return None
+
+
+@lru_cache(maxsize=64)
+def _iso_day_label(iso_date: str) -> Optional[str]:
+    """Weekday header for a ``YYYY-MM-DD`` prefix; parsed once per distinct day."""
     try:
-        if hasattr(st, "secrets"):
-            # Prefer [xai].API_KEY
-            if "xai" in st.secrets and "API_KEY" in st.secrets["xai"]:
-                return st.secrets["xai"]["API_KEY"]
-            # Try flat key
-            if "XAI_API_KEY" in st.secrets:
-                return st.secrets["XAI_API_KEY"]
-    except Exception:
-        pass
-
-    # 2. Local secrets.toml
-    secrets = _load_secrets_from_file()
-    if secrets:
-        xai_section = secrets.get("xai", {}) if isinstance(secrets, dict) else {}
-        if isinstance(xai_section, dict):
-            if xai_section.get("API_KEY"):
-                return xai_section.get("API_KEY")
-            if xai_section.get("XAI_API_KEY"):
-                return xai_section.get("XAI_API_KEY")
-        # flat key
-        if isinstance(secrets, dict) and secrets.get("XAI_API_KEY"):
-            return secrets.get("XAI_API_KEY")
-
-    # 3. Environment variable
-    return os.getenv("XAI_API_KEY")
+        return date.fromisoformat(iso_date).strftime("%a %m/%d")
+    except ValueError:
+        return None
+
+
+def _day_label(created_at) -> Optional[str]:
+    """Day header for a note timestamp (ISO string from the DB or a datetime)."""
+    if isinstance(created_at, str):
+        # Only the date part matters, so skip building a datetime per note
+        return _iso_day_label(created_at[:10])
+    if isinstance(created_at, date):  # datetime included
+        return created_at.strftime("%a %m/%d")
+    return None
 
 
-def _format_notes_for_prompt(notes: List[Dict]) -> str:
-    """Format notes into a concise bullet list for the prompt."""
-    lines: List[str] = []
+def _iter_prompt_lines(notes: Iterable[Dict]) -> Iterator[str]:
+    """Yield the day headers and note bullets that make up the prompt's notes block."""
+    seen = set()
+    current_day: object = ()  # sentinel so the first note always opens a header
+    limit = NOTE_SNIPPET_MAX_CHARS
+    omitted = 0
     for note in notes:
         content = str(note.get("content", "")).strip()
-        created_at = note.get("created_at")
-        ts: Optional[str] = None
-        try:
-            if isinstance(created_at, str):
-                # ISO format expected from DB
-                dt = datetime.fromisoformat(created_at)
-            else:
-                dt = created_at
-            if isinstance(dt, datetime):
-                ts = dt.strftime("%a %m/%d %H:%M")
-        except Exception:
-            ts = None
-        prefix = f"- [{ts}] " if ts else "- "
+        key = " ".join(content.lower().split())
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        if len(seen) > PROMPT_MAX_NOTES:
+            omitted += 1
+            continue
+
+        day = _day_label(note.get("created_at"))
+        if day != current_day:
+            yield f"{day or 'Undated'}:"
+            current_day = day
+
         # Trim overly long single notes for prompt sanity
-        snippet = content if len(content) <= 400 else (content[:397] + "...")
-        lines.append(prefix + snippet)
-    return "\n".join(lines) if lines else "- (No notes logged this week)"
+        yield f"- {content}" if len(content) <= limit else f"- {content[:limit - 3]}..."
+    if omitted:
+        yield f"... and {omitted} more"
+
+
+def _format_notes_for_prompt(notes: List[Dict]) -> str:
+    """Format notes into a concise bullet list for the prompt.
+
+    Prompt tokens drive latency and cost, so notes repeated verbatim (ignoring case
+    and whitespace) are sent once, consecutive notes from the same day share one
+    date header, and only the first PROMPT_MAX_NOTES distinct notes are listed.
+    """
+    return "\n".join(_iter_prompt_lines(notes)) or "- (No notes logged this week)"
+
+
+def _render_email(parsed: Dict, user_display_name: str, recipient_name: Optional[str]) -> str:
+    """Build the plain-text email from the structured-output fields."""
+    subject = parsed.get("subject")
+    bullets = parsed.get("bullets") or []
+    next_week = parsed.get("next_week") or []
+
+    # Construct a plain-text email body with optional subject, greeting, bullets, next week, and closing
+    lines = []
+    if subject:
+        lines.append(f"Subject: {subject}")
+        lines.append("")
+    # Greeting line addressed to manager/recipient if provided
+    if recipient_name:
+        lines.append(f"Hi {recipient_name},")
+        lines.append("")
+    for b in bullets:
+        lines.append(f"- {b}")
+    if next_week:
+        lines.append("")
+        lines.append("Next week:")
+        for nb in next_week:
+            lines.append(f"- {nb}")
+    # Always add closing signature based on the user's display name
+    if user_display_name:
+        lines.append("")
+        lines.append("Regards,")
+        lines.append(user_display_name)
+    return "\n".join(lines).strip()
+
+
+def _iter_sse_content(resp) -> Iterator[str]:
+    """Yield the message content deltas of a streamed (server-sent events) chat completion."""
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        choices = _json_loads(data).get("choices") or [{}]
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+
+def _iter_json_fields(chunks: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (key, value) pairs from a flat JSON object arriving in pieces.
+
+    Values must be strings or arrays of strings, as in the weekly_email schema;
+    each array item is yielded on its own as soon as its closing quote arrives.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos = "", 0
+    key, in_array = None, False
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            # Structure characters carry no data for a flat object of strings
+            while pos < len(buf) and buf[pos] in ' \t\r\n{}:,':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "[":
+                in_array, pos = True, pos + 1
+                continue
+            if buf[pos] == "]":
+                in_array, key, pos = False, None, pos + 1
+                continue
+            try:
+                value, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # Token not complete yet; wait for the next chunk
+            if key is None:
+                key = value
+            else:
+                yield key, value
+                if not in_array:
+                    key = None
+
+
+def _collect_streamed_content(resp, on_progress: Callable[[str], None], user_display_name: str,
+                              recipient_name: Optional[str]) -> str:
+    """Read a streamed completion, reporting the email rendered so far after each finished field."""
+    parts: List[str] = []
+
+    def deltas():
+        for delta in _iter_sse_content(resp):
+            parts.append(delta)
+            yield delta
+
+    # Content that is not the requested JSON yields no fields and is simply collected
+    partial: Dict = {}
+    try:
+        for key, value in _iter_json_fields(deltas()):
+            if key in ("bullets", "next_week"):
+                partial.setdefault(key, []).append(value)
+            else:
+                partial[key] = value
+            on_progress(_render_email(partial, user_display_name, recipient_name))
+    finally:
+        resp.close()
+    return "".join(parts)
 
 
 def draft_weekly_email(notes: List[Dict], user_display_name: str, *, model: str = DEFAULT_MODEL,
                        tone: str = "professional", include_subject: bool = True, max_bullets: int | None = None,
-                       recipient_name: Optional[str] = None) -> str:
+                       recipient_name: Optional[str] = None,
+                       on_progress: Optional[Callable[[str], None]] = None) -> str:
     """Call xAI Grok to draft a weekly performance email based on notes.
 
     Returns the email body text (and subject line if include_subject=True).
+    When on_progress is given, the completion is streamed and on_progress is
+    called with the email rendered so far each time a subject or bullet completes.
     """
     api_key = get_xai_api_key()
     if not api_key:
@@ -169,30 +309,29 @@ def draft_weekly_email(notes: List[Dict], user_display_name: str, *, model: str
         "response_format": response_format,
     }
 
-    # Prefer requests when available; it tends to play nicer with Cloudflare/CDN
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}",
-        # Some CDNs block default Python urllib; a UA header can help avoid 1010/1020
-        "User-Agent": "performance-emailer/1.0 (+https://localhost) Python-requests",
-        "Accept": "application/json",
-    }
+    # The API key is resolved per call, so it is not baked into the shared session
+    auth_headers = {"Authorization": f"Bearer {api_key}"}
 
     try:
+        # Prefer requests when available; it tends to play nicer with Cloudflare/CDN
+        streaming = on_progress is not None and _HAS_REQUESTS
         if _HAS_REQUESTS:
-            resp = requests.post(
+            payload["stream"] = streaming
+            resp = _SESSION.post(
                 f"{XAI_API_BASE}/chat/completions",
-                headers=headers,
-                json=payload,
+                headers={**auth_headers, "Content-Type": "application/json"},
+                data=_json_dumps(payload),
                 timeout=60,
+                stream=streaming,
             )
             status = resp.status_code
-            text = resp.text
+            # A successful streamed body is consumed incrementally below
+            text = "" if streaming and 200 <= status < 300 else resp.text
         else:
             req = urllib.request.Request(
                 url=f"{XAI_API_BASE}/chat/completions",
-                headers=headers,
-                data=json.dumps(payload).encode("utf-8"),
+                headers={**_DEFAULT_HEADERS, **auth_headers, "Content-Type": "application/json"},
+                data=_json_dumps(payload),
                 method="POST",
             )
             with urllib.request.urlopen(req, timeout=60) as r:
@@ -210,7 +349,11 @@ def draft_weekly_email(notes: List[Dict], user_display_name: str, *, model: str
         if status < 200 or status >= 300:
             raise RuntimeError(f"xAI API error {status}: {text}")
 
-        data = json.loads(text)
+        if streaming:
+            content = _collect_streamed_content(resp, on_progress, user_display_name, recipient_name)
+            data = {"choices": [{"message": {"content": content}}]}
+        else:
+            data = _json_loads(text)
         # With structured outputs, the content should be a JSON object string
         # Parse the JSON content when present; otherwise fall back to top-level
         message = data.get("choices", [{}])[0].get("message", {})
@@ -218,7 +361,7 @@ def draft_weekly_email(notes: List[Dict], user_display_name: str, *, model: str
         parsed = None
         try:
             if content and isinstance(content, str) and content.strip().startswith("{"):
-                parsed = json.loads(content)
+                parsed = _json_loads(content)
             elif "parsed" in message:
                 # Some SDKs put parsed object here; handle defensively
                 parsed = message.get("parsed")
@@ -226,32 +369,7 @@ def draft_weekly_email(notes: List[Dict], user_display_name: str, *, model: str
             parsed = None
 
         if isinstance(parsed, dict) and "bullets" in parsed:
-            subject = parsed.get("subject")
-            bullets = parsed.get("bullets") or []
-            next_week = parsed.get("next_week") or []
-
-            # Construct a plain-text email body with optional subject, greeting, bullets, next week, and closing
-            lines = []
-            if subject:
-                lines.append(f"Subject: {subject}")
-                lines.append("")
-            # Greeting line addressed to manager/recipient if provided
-            if recipient_name:
-                lines.append(f"Hi {recipient_name},")
-                lines.append("")
-            for b in bullets:
-                lines.append(f"- {b}")
-            if next_week:
-                lines.append("")
-                lines.append("Next week:")
-                for nb in next_week:
-                    lines.append(f"- {nb}")
-            # Always add closing signature based on the user's display name
-            if user_display_name:
-                lines.append("")
-                lines.append("Regards,")
-                lines.append(user_display_name)
-            return "\n".join(lines).strip()
+            return _render_email(parsed, user_display_name, recipient_name)
 
         # Fallback: original behavior
         content_text = (
@@ -6,6 +6,7 @@ This module only builds strings; the xAI client is responsible for calling the A
 """
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import List, Tuple, Optional
 
 # Optional: expose a curated set of tones for UI selection
@@ -25,6 +26,7 @@ WEEKLY_EMAIL_SYSTEM_BASE = (
 )
 
 
+@lru_cache(maxsize=64)
 def build_system_prompt(tone: str) -> str:
     """Compose the system message for weekly emails, including tone and length guidance."""
     tone = (tone or "professional").strip()
@@ -34,12 +36,9 @@ def build_system_prompt(tone: str) -> str:
     )
 
 
-def build_user_prompt(user_display_name: str, notes_block: str, *, include_subject: bool, max_bullets: int | None = None, recipient_name: Optional[str] = None) -> str:
-    """Compose the user message given display name and a preformatted notes block.
-
-    notes_block should already be a human-readable bullet list.
-    """
-    who = user_display_name or "the user"
+@lru_cache(maxsize=64)
+def _user_prompt_template(who: str, include_subject: bool, max_bullets: int | None, recipient_name: Optional[str]) -> Tuple[str, str]:
+    """Return the (head, tail) text around the notes block; assembled once per parameter set."""
     suffix = (
         "Return a subject line (Subject:) and the email body."
         if include_subject
@@ -50,9 +49,12 @@ def build_user_prompt(user_display_name: str, notes_block: str, *, include_subje
         f"Address the email to {recipient_name} by name in the opening (we will add the greeting ourselves).\n"
         if recipient_name else ""
     )
-    return (
+    head = (
         f"Draft my weekly performance email as {who}.\n"
-        f"Here are my raw notes for the week:\n\n{notes_block}\n\n"
+        "Here are my raw notes for the week:\n\n"
+    )
+    tail = (
+        "\n\n"
         "Provide the 'bullets' as plain strings with no leading hyphens, numbering, or markdown. "
         "Keep bullets action/impact-centric.\n"
         f"{limit_line}"
@@ -60,6 +62,17 @@ def build_user_prompt(user_display_name: str, notes_block: str, *, include_subje
         "Always end the email with a closing line of 'Regards,' followed by the user's full name.\n"
         f"{suffix}"
     )
+    return head, tail
+
+
+def build_user_prompt(user_display_name: str, notes_block: str, *, include_subject: bool, max_bullets: int | None = None, recipient_name: Optional[str] = None) -> str:
+    """Compose the user message given display name and a preformatted notes block.
+
+    notes_block should already be a human-readable bullet list. It changes on every
+    draft, so only the surrounding template is cached.
+    """
+    head, tail = _user_prompt_template(user_display_name or "the user", include_subject, max_bullets, recipient_name)
+    return head + notes_block + tail
 
 
 def weekly_email_messages(
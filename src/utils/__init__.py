@@ -0,0 +1,8 @@
+"""
+Utils package for helpers shared across components and integrations.
+"""
+
+from .drafts import parse_subject
+from .secrets import load_secrets, load_secrets_from_toml
+
+__all__ = ['load_secrets', 'load_secrets_from_toml', 'parse_subject']
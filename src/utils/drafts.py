@@ -0,0 +1,23 @@
+"""
+Helpers for splitting an edited email draft into its parts.
+"""
+import re
+from typing import Tuple
+
+DEFAULT_SUBJECT = "Weekly Update"
+
+# "Subject: ..." on the first line, then the body after any blank lines
+_SUBJECT_RE = re.compile(r'Subject:([^\n]*)(?:\n+(.*))?', re.DOTALL)
+
+
+def parse_subject(draft: str) -> Tuple[str, str]:
+    """Split a draft into (subject, body).
+
+    A first line of the form ``Subject: ...`` becomes the subject (falling back to
+    DEFAULT_SUBJECT when empty) and is removed from the body; otherwise the whole
+    draft is the body.
+    """
+    match = _SUBJECT_RE.match(draft)
+    if not match:
+        return DEFAULT_SUBJECT, draft
+    return match.group(1).strip() or DEFAULT_SUBJECT, match.group(2) or ""
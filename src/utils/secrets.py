@@ -0,0 +1,86 @@
+"""
+Shared loader for the local .streamlit/secrets.toml file.
+
+The database, auth, email and xAI helpers all read this file; parsing happens
+once per file version and the result is shared by every caller.
+
+load_secrets() layers Streamlit secrets, the secrets file and environment
+variables into one lookup with dotted keys for sections ("xai.API_KEY").
+"""
+import functools
+import logging
+import os
+from collections import ChainMap
+from collections.abc import Mapping
+from typing import Dict, Optional
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+logger = logging.getLogger(__name__)
+
+SECRETS_PATH = os.path.join('.streamlit', 'secrets.toml')
+
+
+@functools.lru_cache(maxsize=1)
+def _parse_secrets_file(secrets_path: str, mtime: float) -> Optional[Dict]:
+    """Parse a secrets file; cached per (path, mtime) so edits are picked up."""
+    try:
+        with open(secrets_path, 'rb') as f:
+            return tomllib.load(f)
+    except Exception as e:
+        logger.warning("Could not load secrets.toml: %s", e)
+    return None
+
+
+def load_secrets_from_toml() -> Optional[Dict]:
+    """Load secrets from .streamlit/secrets.toml file (parsed once per file version).
+
+    Returns None when the file is missing or invalid. The returned dict is
+    shared between callers and must not be modified.
+    """
+    try:
+        mtime = os.path.getmtime(SECRETS_PATH)
+    except OSError:
+        return None
+    return _parse_secrets_file(SECRETS_PATH, mtime)
+
+
+def _flatten(mapping: Mapping, prefix: str = '') -> Dict:
+    """Flatten nested sections into dotted keys: {"xai": {"API_KEY": k}} -> {"xai.API_KEY": k}."""
+    flat = {}
+    for key, value in mapping.items():
+        if isinstance(value, Mapping):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+@functools.lru_cache(maxsize=1)
+def _secret_layers(mtime: Optional[float]) -> ChainMap:
+    """Flattened Streamlit secrets over the flattened file; rebuilt when the file changes."""
+    try:
+        import streamlit as st
+        # Raises when no secrets file exists at all
+        streamlit_layer = _flatten(st.secrets)
+    except Exception:
+        streamlit_layer = {}
+    secrets = _parse_secrets_file(SECRETS_PATH, mtime) if mtime is not None else None
+    return ChainMap(streamlit_layer, _flatten(secrets or {}))
+
+
+def load_secrets() -> ChainMap:
+    """Return one read-only view over every secrets source, in priority order.
+
+    1) st.secrets  2) .streamlit/secrets.toml  3) environment variables.
+    Sections are addressed with dotted keys ("smtp.HOST"); environment
+    variables keep their own names ("SMTP_HOST") and are always read live.
+    """
+    try:
+        mtime = os.path.getmtime(SECRETS_PATH)
+    except OSError:
+        mtime = None
+    return ChainMap(*_secret_layers(mtime).maps, os.environ)
@@ -0,0 +1,55 @@
+"""
+Shared pytest fixtures for the database tests.
+"""
+from types import MappingProxyType
+from unittest.mock import patch
+
+import psycopg2.pool
+import pytest
+
+from tests.dummies import DummyConn, FakePool
+
+# Mocked secrets.toml content for building a DatabaseManager; read-only so
+# no test can leak a change into the next one
+FAKE_SECRETS = MappingProxyType({
+    'database': MappingProxyType({
+        'DB_HOST': 'localhost',
+        'DB_NAME': 'test_db',
+        'DB_USER': 'test_user',
+        'DB_PASSWORD': 'test_pass',
+        'DB_PORT': '5432'
+    })
+})
+
+
+@pytest.fixture(scope="session")
+def shared_db_manager():
+    """One manager for the whole session; building it resolves the configuration."""
+    # Imported here so suites that never touch the database do not load it
+    from src.components.database import DatabaseManager
+    with patch('src.components.database.load_secrets_from_toml', return_value=FAKE_SECRETS):
+        yield DatabaseManager()
+
+
+@pytest.fixture
+def db_manager(shared_db_manager):
+    """The shared manager with per-test state (lookup cache, pool) reset."""
+    shared_db_manager._cache.clear()
+    for attr in ('_pool', '_last_used', '_prepared'):
+        shared_db_manager.__dict__.pop(attr, None)
+    return shared_db_manager
+
+
+@pytest.fixture(scope="session")
+def dummy_conn():
+    # One connection for the session; mock_db resets it rather than rebuilding it
+    return DummyConn()
+
+
+@pytest.fixture
+def mock_db(monkeypatch, db_manager, dummy_conn):
+    """(manager, connection, cursor, pool): the manager checks dummy_conn out of a FakePool."""
+    dummy_conn.reset()
+    pool = FakePool(dummy_conn)
+    monkeypatch.setattr(psycopg2.pool, 'ThreadedConnectionPool', lambda *args, **kwargs: pool)
+    return db_manager, dummy_conn, dummy_conn.cursor_obj, pool
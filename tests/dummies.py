@@ -0,0 +1,127 @@
+"""
+Lightweight stand-ins for psycopg2 connections and cursors.
+
+Plain attribute access keeps them much cheaper than MagicMock graphs, and they
+record just what the database tests assert on.
+"""
+from collections import deque
+import re
+
+# Tests inspect the last statement or two; a bounded history keeps a cursor reused
+# across stress loops from growing without limit
+HISTORY_LEN = 16
+
+# Leading keyword and target table, e.g. "INSERT INTO sent_emails ..." -> INSERT:sent_emails
+_FINGERPRINT_RE = re.compile(r'\s*(\w+)\s+(?:INTO\s+|FROM\s+|TABLE\s+)?(\w+)', re.IGNORECASE)
+
+
+class DummyCursor:
+    def __init__(self, responses=None):
+        self.queries = deque(maxlen=HISTORY_LEN)
+        self.params = deque(maxlen=HISTORY_LEN)
+        self.fingerprints = set()
+        self._responses = responses or {}
+        self.reset()
+
+    def reset(self):
+        """Forget recorded statements so one cursor can serve every test."""
+        self.queries.clear()
+        self.params.clear()
+        self.fingerprints.clear()
+        self.rowcount = 1
+        self._fetchone_value = [42]
+        self._fetchall_value = []
+        self._execute_error = None
+        self.itersize = None
+        self.copied = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql.strip())
+        m = _FINGERPRINT_RE.match(sql)
+        if m:
+            self.fingerprints.add(f"{m.group(1).upper()}:{m.group(2).lower()}")
+        if params is not None:
+            self.params.append(params)
+        # A failing statement still reached the server
+        if self._execute_error is not None:
+            raise self._execute_error
+
+    def copy_expert(self, sql, file):
+        self.queries.append(sql.strip())
+        self.copied = file.read()
+
+    def fetchone(self):
+        return self._fetchone_value
+
+    def fetchall(self):
+        return self._fetchall_value
+
+    # Named (server-side) cursors are iterated rather than fetched
+    def __iter__(self):
+        return iter(self._fetchall_value)
+
+
+class DummyConn:
+    def __init__(self):
+        self.cursor_obj = DummyCursor()
+        self.reset()
+
+    def reset(self):
+        """Clear transaction counters and the cursor's recorded statements."""
+        self.commits = 0
+        self.rollbacks = 0
+        self.entered = 0
+        self.autocommit = False
+        self.closed = False
+        self.cursor_kwargs = []
+        self.cursor_obj.reset()
+
+    def cursor(self, **kwargs):
+        self.cursor_kwargs.append(kwargs)
+        return self.cursor_obj
+
+    # Like psycopg2, the connection block commits on success and rolls back on error
+    def __enter__(self):
+        self.entered += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    """Stands in for ThreadedConnectionPool: hands out one connection and counts returns."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.getconn_count = 0
+        self.putconn_count = 0
+        self.discarded = 0
+
+    def getconn(self):
+        self.getconn_count += 1
+        return self.conn
+
+    def putconn(self, conn, close=False):
+        self.putconn_count += 1
+        if close:
+            self.discarded += 1
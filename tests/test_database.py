@@ -1,195 +1,320 @@
 """
 Unit tests for database operations.
 """
-import unittest
 from unittest.mock import Mock, patch, MagicMock
-import sys
 import os
+import time
+from types import MappingProxyType, SimpleNamespace
 
-# Add the parent directory to the path to import from src
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pytest
 
-from src.components.database import DatabaseManager
+from src.components.database import _USER_UNIQUE_FIELDS, DatabaseManager, load_secrets_from_toml
+from tests.conftest import FAKE_SECRETS
 
+# connection_params that FAKE_SECRETS resolves to
+EXPECTED_PARAMS = MappingProxyType({
+    'host': 'localhost',
+    'database': 'test_db',
+    'user': 'test_user',
+    'password': 'test_pass',
+    'port': '5432'
+})
 
-class TestDatabaseManager(unittest.TestCase):
-    """Test cases for DatabaseManager class."""
+
+@patch('src.components.database.load_secrets_from_toml')
+def test_init_with_secrets_toml(mock_load_secrets):
+    """Test initialization with secrets.toml file."""
+    mock_load_secrets.return_value = FAKE_SECRETS
+    db_manager = DatabaseManager()
+    assert db_manager.connection_params == EXPECTED_PARAMS
+
+
+@patch('src.components.database.load_secrets_from_toml')
+@patch.dict(os.environ, FAKE_SECRETS['database'])
+def test_init_fallback_to_env_vars(mock_load_secrets):
+    """Test fallback to environment variables when secrets.toml is not available."""
+    mock_load_secrets.return_value = None  # Simulate missing secrets.toml
+    db_manager = DatabaseManager()
+    assert db_manager.connection_params == EXPECTED_PARAMS
+
+
+@patch('psycopg2.connect')
+def test_get_connection_success(mock_connect, db_manager):
+    """Test successful database connection checked out from the pool."""
+    mock_conn = Mock()
+    mock_connect.return_value = mock_conn
     
-    @patch('src.components.database.load_secrets_from_toml')
-    def setUp(self, mock_load_secrets):
-        """Set up test fixtures."""
-        # Mock secrets.toml loading to return test configuration
-        mock_load_secrets.return_value = {
-            'database': {
-                'DB_HOST': 'localhost',
-                'DB_NAME': 'test_db',
-                'DB_USER': 'test_user',
-                'DB_PASSWORD': 'test_pass',
-                'DB_PORT': '5432'
-            }
-        }
-        self.db_manager = DatabaseManager()
-
-    @patch('src.components.database.load_secrets_from_toml')
-    def test_init_with_secrets_toml(self, mock_load_secrets):
-        """Test initialization with secrets.toml file."""
-        mock_load_secrets.return_value = {
-            'database': {
-                'DB_HOST': 'localhost',
-                'DB_NAME': 'test_db',
-                'DB_USER': 'test_user',
-                'DB_PASSWORD': 'test_pass',
-                'DB_PORT': '5432'
-            }
-        }
-        db_manager = DatabaseManager()
-        expected_params = {
-            'host': 'localhost',
-            'database': 'test_db',
-            'user': 'test_user',
-            'password': 'test_pass',
-            'port': '5432'
-        }
-        self.assertEqual(db_manager.connection_params, expected_params)
-
-    @patch('src.components.database.load_secrets_from_toml')
-    @patch.dict(os.environ, {
-        'DB_HOST': 'localhost',
-        'DB_NAME': 'test_db',
-        'DB_USER': 'test_user',
-        'DB_PASSWORD': 'test_pass',
-        'DB_PORT': '5432'
-    })
-    def test_init_fallback_to_env_vars(self, mock_load_secrets):
-        """Test fallback to environment variables when secrets.toml is not available."""
-        mock_load_secrets.return_value = None  # Simulate missing secrets.toml
-        db_manager = DatabaseManager()
-        expected_params = {
-            'host': 'localhost',
-            'database': 'test_db',
-            'user': 'test_user',
-            'password': 'test_pass',
-            'port': '5432'
-        }
-        self.assertEqual(db_manager.connection_params, expected_params)
+    result = db_manager.get_connection()
     
-    @patch('src.components.database.psycopg2.connect')
-    def test_get_connection_success(self, mock_connect):
-        """Test successful database connection."""
-        mock_conn = Mock()
-        mock_connect.return_value = mock_conn
-        
-        result = self.db_manager.get_connection()
-        
-        self.assertEqual(result, mock_conn)
-        mock_connect.assert_called_once_with(**self.db_manager.connection_params)
+    assert result == mock_conn
+    mock_connect.assert_called_with(**db_manager.connection_params)
+    assert mock_connect.call_count == DatabaseManager.POOL_MIN_CONN
+
+
+def test_get_connection_replaces_stale_connection(db_manager):
+    """Test an idle pooled connection that fails its probe is discarded and replaced once."""
+    import psycopg2
+    stale_conn = MagicMock()
+    stale_conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
+        psycopg2.OperationalError("server closed the connection")
+    fresh_conn = MagicMock()
+    mock_pool = MagicMock()
+    mock_pool.getconn.side_effect = [stale_conn, fresh_conn]
+    db_manager._pool = mock_pool
+    db_manager._last_used = {id(stale_conn): time.monotonic() - 60}
+
+    result = db_manager.get_connection()
+
+    assert result == fresh_conn
+    mock_pool.putconn.assert_called_once_with(stale_conn, close=True)
+
+
+def test_release_connection_returns_to_pool(db_manager):
+    """Test released connections go back to the pool instead of being closed."""
+    mock_conn = MagicMock()
+    mock_pool = MagicMock()
+    db_manager._pool = mock_pool
+    db_manager._last_used = {}
+
+    db_manager.release_connection(mock_conn)
+
+    mock_pool.putconn.assert_called_once_with(mock_conn, close=False)
+    mock_conn.close.assert_not_called()
+
+
+@patch('psycopg2.connect')
+@patch('src.components.database.logger')
+def test_get_connection_failure(mock_logger, mock_connect, db_manager):
+    """Test failed database connection."""
+    mock_connect.side_effect = Exception("Connection failed")
     
-    @patch('src.components.database.psycopg2.connect')
-    @patch('src.components.database.st')
-    def test_get_connection_failure(self, mock_st, mock_connect):
-        """Test failed database connection."""
-        mock_connect.side_effect = Exception("Connection failed")
-        
-        result = self.db_manager.get_connection()
-        
-        self.assertIsNone(result)
-        mock_st.error.assert_called_once()
+    result = db_manager.get_connection()
     
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_test_connection_success(self, mock_get_connection):
-        """Test successful connection test."""
-        # Use MagicMock to support context manager protocol
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_get_connection.return_value = mock_conn
-
-        result = self.db_manager.test_connection()
-
-        self.assertTrue(result)
-        # Ensure cursor context manager used and connection closed
-        mock_conn.cursor.assert_called()
-        mock_conn.close.assert_called_once()
+    assert result is None
+    mock_logger.exception.assert_called_once()
+
+
+def test_test_connection_success(mock_db):
+    """Test successful connection test."""
+    db_manager, conn, cursor, pool = mock_db
+
+    result = db_manager.test_connection()
+
+    assert result
+    assert cursor.queries[-1] == "SELECT 1"
+    # Connection handed back to the pool, not closed
+    assert pool.putconn_count == 1
+    assert not conn.closed
+
+
+@patch.object(DatabaseManager, 'get_connection')
+def test_test_connection_failure(mock_get_connection, db_manager):
+    """Test failed connection test."""
+    mock_get_connection.return_value = None
     
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_test_connection_failure(self, mock_get_connection):
-        """Test failed connection test."""
-        mock_get_connection.return_value = None
-        
-        result = self.db_manager.test_connection()
-        
-        self.assertFalse(result)
+    result = db_manager.test_connection()
     
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_get_all_users_success(self, mock_get_connection):
-        """Test successful retrieval of all users."""
-        # Mock database connection and cursor (supports context manager)
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_get_connection.return_value = mock_conn
-        
-        # Mock query result
-        mock_cursor.fetchall.return_value = [
-            {'id': 1, 'name': 'John Doe', 'email': 'john@example.com'},
-            {'id': 2, 'name': 'Jane Smith', 'email': 'jane@example.com'}
-        ]
-        
-        result = self.db_manager.get_all_users()
-        
-        self.assertEqual(len(result), 2)
-        self.assertEqual(result[0]['name'], 'John Doe')
-        self.assertEqual(result[1]['name'], 'Jane Smith')
-        mock_cursor.execute.assert_called_once()
+    assert not result
+
+
+def test_get_all_users_success(mock_db):
+    """Test successful retrieval of all users."""
+    db_manager, conn, cursor, pool = mock_db
+    # Rows come back as plain tuples in SELECT column order
+    cursor._fetchall_value = [
+        (1, 'john', 'john@example.com', 'John Doe', True, '2024-01-01', None),
+        (2, 'jane', 'jane@example.com', 'Jane Smith', True, '2024-01-01', None)
+    ]
+
+    result = db_manager.get_all_users()
+
+    assert len(result) == 2
+    assert result[0]['display_name'] == 'John Doe'
+    assert result[1]['display_name'] == 'Jane Smith'
+    assert result[1]['email'] == 'jane@example.com'
+    assert len(cursor.queries) == 1
+
+
+@patch.object(DatabaseManager, 'get_connection')
+def test_get_all_users_no_connection(mock_get_connection, db_manager):
+    """Test get_all_users when connection fails."""
+    mock_get_connection.return_value = None
     
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_get_all_users_no_connection(self, mock_get_connection):
-        """Test get_all_users when connection fails."""
-        mock_get_connection.return_value = None
-        
-        result = self.db_manager.get_all_users()
-        
-        self.assertEqual(result, [])
+    result = db_manager.get_all_users()
     
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_save_note_success(self, mock_get_connection):
-        """Test successful note saving."""
-        # Mock database connection and cursor (supports context manager)
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_get_connection.return_value = mock_conn
-        
-        result = self.db_manager.save_note(1, "Test note content")
-        
-        self.assertTrue(result)
-        mock_cursor.execute.assert_called_once()
-        mock_conn.commit.assert_called_once()
+    assert result == []
+
+
+def test_read_only_op_skips_transaction_block(mock_db):
+    """Test read_only ops run on the autocommit connection without `with conn` (no BEGIN/COMMIT)."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchall_value = [(1, 'john', 'john@example.com', 'John Doe', True, '2024-01-01', None)]
+
+    assert len(db_manager.get_all_users()) == 1
+    assert conn.entered == 0
+    assert (conn.commits, conn.rollbacks) == (0, 0)
+    # autocommit is switched back off before the connection returns to the pool
+    assert conn.autocommit is False
+    assert pool.putconn_count == 1
+
+
+def test_save_note_success(mock_db):
+    """Test successful note saving."""
+    db_manager, conn, cursor, pool = mock_db
+
+    result = db_manager.save_note(1, "Test note content")
+
+    assert result
+    assert 'EXECUTE:save_note_stmt' in cursor.fingerprints
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+    assert pool.putconn_count == 1
+
+
+def test_save_note_prepares_statement_once_per_pooled_connection(mock_db):
+    """Test hot statements are PREPAREd on first use and then only EXECUTEd."""
+    db_manager, conn, cursor, pool = mock_db
+
+    assert db_manager.save_note(1, "First note")
+    assert db_manager.save_note(1, "Second note")
+
+    statements = list(cursor.queries)
+    assert len(statements) == 3
+    assert statements[0].startswith("PREPARE save_note_stmt")
+    assert statements[1:] == ["EXECUTE save_note_stmt (%s, %s)"] * 2
+    assert cursor.params[-1] == (1, "Second note")
+
+
+def test_save_notes_bulk_streams_one_copy(mock_db):
+    """Test bulk note saving sends all rows through a single COPY."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor.rowcount = 3
+
+    result = db_manager.save_notes_bulk(1, ["First", 'Has "quotes", commas\nand lines', ""])
+
+    assert result == 3
+    assert len(cursor.queries) == 1
+    assert "COPY notes (user_id, content) FROM STDIN" in cursor.queries[-1]
+    assert cursor.copied == '1,"First"\n1,"Has ""quotes"", commas\nand lines"\n1,""\n'
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+
+@patch.object(DatabaseManager, 'get_connection')
+def test_save_notes_bulk_empty_skips_database(mock_get_connection, db_manager):
+    """Test an empty batch never checks out a connection."""
+    assert db_manager.save_notes_bulk(1, []) == 0
+    mock_get_connection.assert_not_called()
+
+
+def test_iter_notes_for_user_streams_from_named_cursor(mock_db):
+    """Test notes are read lazily through a server-side cursor."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchall_value = [
+        (2, 'Second', '2024-01-02', '2024-01-02T10:00:00', []),
+        (1, 'First', '2024-01-01', '2024-01-01T10:00:00', [{'id': 5, 'name': 'Work', 'color': '#000000'}]),
+    ]
+
+    notes = db_manager.iter_notes_for_user(1, batch=100)
+    assert pool.getconn_count == 0
+
+    first = next(notes)
+    assert first['content'] == 'Second'
+    assert conn.cursor_kwargs == [{'name': 'notes_iter'}]
+    assert cursor.itersize == 100
+    assert [note['id'] for note in notes] == [1]
+    # Held for the whole iteration, then returned
+    assert pool.putconn_count == 1
+
+
+@patch.object(DatabaseManager, 'get_connection')
+def test_save_note_no_connection(mock_get_connection, db_manager):
+    """Test save_note when connection fails."""
+    mock_get_connection.return_value = None
     
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_save_note_no_connection(self, mock_get_connection):
-        """Test save_note when connection fails."""
-        mock_get_connection.return_value = None
-        
-        result = self.db_manager.save_note(1, "Test note content")
-        
-        self.assertFalse(result)
+    result = db_manager.save_note(1, "Test note content")
     
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_create_user_success(self, mock_get_connection):
-        """Test successful user creation."""
-        # Mock database connection and cursor (supports context manager)
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_get_connection.return_value = mock_conn
-        
-        result = self.db_manager.create_user("Test User", "test@example.com")
-        
-        self.assertTrue(result)
-        mock_cursor.execute.assert_called_once()
-        mock_conn.commit.assert_called_once()
-
-
-if __name__ == '__main__':
-    unittest.main()
+    assert not result
+
+
+def test_create_tables_runs_single_script(mock_db):
+    """Test all DDL is sent to the server in one execute call."""
+    db_manager, conn, cursor, pool = mock_db
+
+    result = db_manager.create_tables()
+
+    assert result
+    assert len(cursor.queries) == 1
+    script = cursor.queries[-1]
+    assert script.count("CREATE TABLE IF NOT EXISTS") == 5
+    assert "idx_notes_user_date" in script
+
+
+def test_create_user_success(mock_db):
+    """Test successful user creation."""
+    db_manager, conn, cursor, pool = mock_db
+
+    result = db_manager.create_user("Test User", "test@example.com")
+
+    assert result
+    assert len(cursor.queries) == 1
+    assert cursor.params[-1][0] == "test_user"
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+
+def _unique_violation(constraint_name):
+    """An IntegrityError whose diagnostics name the violated constraint."""
+    import psycopg2
+
+    class UniqueViolation(psycopg2.IntegrityError):
+        diag = SimpleNamespace(constraint_name=constraint_name)
+
+    return UniqueViolation(f'duplicate key value violates unique constraint "{constraint_name}"')
+
+
+@pytest.mark.parametrize("constraint,field", sorted(_USER_UNIQUE_FIELDS.items()))
+def test_create_user_atomic_reports_taken_field(mock_db, constraint, field):
+    """Test a unique violation on username or email names the field and rolls back."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._execute_error = _unique_violation(constraint)
+
+    result = db_manager.create_user_atomic("alice", "alice@example.com", "hash", "Alice")
+
+    assert result == (None, field)
+    assert len(cursor.queries) == 1
+    assert conn.rollbacks == 1
+    assert pool.putconn_count == 1
+
+
+def test_create_user_atomic_other_integrity_error_fails(mock_db):
+    """Test violations of other constraints are not mistaken for a taken username or email."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._execute_error = _unique_violation('app_users_pkey')
+
+    assert db_manager.create_user_atomic("alice", "alice@example.com", "hash", "Alice") == (None, None)
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+
+
+@pytest.fixture
+def secrets_path(tmp_path, monkeypatch):
+    """Run in an empty directory with a .streamlit folder; returns the secrets.toml path."""
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('.streamlit')
+    return os.path.join('.streamlit', 'secrets.toml')
+
+
+def test_missing_file_returns_none(secrets_path):
+    """Test a missing secrets.toml yields None."""
+    assert load_secrets_from_toml() is None
+
+
+def test_parsed_once_until_file_changes(secrets_path):
+    """Test the file is parsed once and re-read after it is modified."""
+    with open(secrets_path, 'w') as f:
+        f.write('[database]\nDB_HOST = "first"\n')
+    os.utime(secrets_path, (1_000_000, 1_000_000))
+    first = load_secrets_from_toml()
+    assert load_secrets_from_toml() is first
+
+    with open(secrets_path, 'w') as f:
+        f.write('[database]\nDB_HOST = "second"\n')
+    os.utime(secrets_path, (2_000_000, 2_000_000))
+    assert load_secrets_from_toml()['database']['DB_HOST'] == 'second'
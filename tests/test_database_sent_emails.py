@@ -1,81 +1,53 @@
-import types
 import pytest
 
-from src.components.database import DatabaseManager
 
-
-class DummyCursor:
-    def __init__(self, responses=None):
-        self.queries = []
-        self.params = []
-        self._responses = responses or {}
-        self.rowcount = 1
-        self._fetchone_value = [42]
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, exc_type, exc, tb):
-        return False
-
-    def execute(self, sql, params=None):
-        self.queries.append(sql.strip())
-        if params is not None:
-            self.params.append(params)
-
-    def fetchone(self):
-        return self._fetchone_value
-
-
-class DummyConn:
-    def __init__(self):
-        self.commits = 0
-        self.rollbacks = 0
-        self.closed = False
-        self.cursor_obj = DummyCursor()
-
-    def cursor(self, *args, **kwargs):
-        return self.cursor_obj
-
-    def commit(self):
-        self.commits += 1
-
-    def rollback(self):
-        self.rollbacks += 1
-
-    def close(self):
-        self.closed = True
-
-
-@pytest.fixture
-def dbm(monkeypatch):
-    dbm = DatabaseManager
-    # monkeypatch connection params with minimal dummy values to avoid ValueError in __init__
-    class DM(DatabaseManager):
-        def __init__(self):
-            self.connection_params = {
-                'host': 'h', 'database': 'd', 'user': 'u', 'password': 'p', 'port': 5432
-            }
-    dm = DM()
-
-    dummy_conn = DummyConn()
-    monkeypatch.setattr(dm, 'get_connection', lambda: dummy_conn)
-    return dm, dummy_conn
-
-
-def test_save_sent_email_inserts_and_returns_id(dbm):
-    dm, dummy_conn = dbm
+def test_save_sent_email_inserts_and_returns_id(mock_db):
+    dm, dummy_conn, _, pool = mock_db
     email_id = dm.save_sent_email(1, 'to@test', 'sub', 'body', status='queued')
     assert email_id == 42
     # Check the query executed
-    assert any('INSERT INTO sent_emails' in q for q in dummy_conn.cursor_obj.queries)
+    assert 'INSERT:sent_emails' in dummy_conn.cursor_obj.fingerprints
     assert dummy_conn.commits == 1
+    assert pool.putconn_count == 1
 
 
-def test_update_sent_email_status_updates_and_commits(dbm):
-    dm, dummy_conn = dbm
+def test_update_sent_email_status_updates_and_commits(mock_db):
+    dm, dummy_conn, _, pool = mock_db
     ok = dm.update_sent_email_status(42, 'sent', None)
     assert ok is True
-    assert any('UPDATE sent_emails' in q for q in dummy_conn.cursor_obj.queries)
+    assert 'UPDATE:sent_emails' in dummy_conn.cursor_obj.fingerprints
     assert dummy_conn.commits == 1
+    assert pool.putconn_count == 1
+
+
+def test_save_sent_email_records_final_status_in_one_write(mock_db):
+    dm, dummy_conn, _, pool = mock_db
+    email_id = dm.save_sent_email(1, 'to@test', 'sub', 'body', status='failed', error_message='boom')
+    assert email_id == 42
+    assert len(dummy_conn.cursor_obj.queries) == 1
+    assert dummy_conn.cursor_obj.params[0][-2:] == ('failed', 'boom')
+    assert dummy_conn.commits == 1
+    assert pool.putconn_count == 1
+
+
+@pytest.mark.parametrize("n", [1, 10, 100, 1000])
+def test_save_sent_emails_bulk_round_trips(mock_db, n):
+    dm, dummy_conn, cursor, pool = mock_db
+    cursor._fetchall_value = [(i,) for i in range(n)]
+    rows = [(f'to{i}@test', 'sub', 'body', 'sent', None) for i in range(n)]
+
+    assert dm.save_sent_emails_bulk(1, rows) == list(range(n))
+    # One statement regardless of n; ids are paired with rows by ordinality
+    assert len(cursor.queries) == 1
+    assert 'WITH ORDINALITY' in cursor.queries[-1]
+    to_emails, subjects, bodies, statuses, errors, user_id = cursor.params[-1]
+    assert len(to_emails) == n and to_emails[0] == 'to0@test'
+    assert user_id == 1
+    assert dummy_conn.commits == 1
+    assert pool.putconn_count == 1
+
 
+def test_save_sent_emails_bulk_empty_skips_database(mock_db):
+    dm, dummy_conn, _, pool = mock_db
+    assert dm.save_sent_emails_bulk(1, []) == []
+    assert not dummy_conn.cursor_obj.queries
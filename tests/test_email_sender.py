@@ -1,5 +1,6 @@
 import types
 import builtins
+from collections import ChainMap
 
 import pytest
 
@@ -7,7 +8,8 @@ from src.integrations import email_sender
 
 
 class DummySMTP:
-    instances = []
+    # Tests use the fresh subclass from the smtp_class fixture, which owns `instances`
+    ssl = False
 
     def __init__(self, host, port, timeout=None):
         self.host = host
@@ -16,7 +18,7 @@ class DummySMTP:
         self.started_tls = False
         self.logged_in = False
         self.sent_messages = []
-        DummySMTP.instances.append(self)
+        type(self).instances.append(self)
 
     def __enter__(self):
         return self
@@ -40,100 +42,169 @@ class DummySMTP:
         self.sent_messages.append(msg)
 
 
-class DummySMTP_SSL(DummySMTP):
-    pass
+# SMTP configurations shared by the tests; none of them mutate these
+TLS_CFG = {
+    "HOST": "smtp.test",
+    "PORT": 587,
+    "USER": "user@test",
+    "PASSWORD": "secret",
+    "FROM": "Daily Notes <no-reply@test>",
+    "USE_TLS": True,
+    "USE_SSL": False,
+}
+SSL_CFG = {
+    "HOST": "smtp.ssl.test",
+    "PORT": 465,
+    "USER": None,
+    "PASSWORD": None,
+    "FROM": "no-reply@ssl.test",
+    "USE_TLS": False,
+    "USE_SSL": True,
+}
+PLAIN_CFG = {
+    "HOST": "smtp.test",
+    "PORT": 587,
+    "USER": None,
+    "PASSWORD": None,
+    "FROM": "no-reply@test",
+    "USE_TLS": False,
+    "USE_SSL": False,
+}
+
+
+@pytest.fixture
+def smtp_class(monkeypatch):
+    """A fresh DummySMTP subclass per test, patched in as smtplib.SMTP (and SMTP_SSL)."""
+    class SMTP(DummySMTP):
+        instances = []
+
+    class SMTP_SSL(SMTP):
+        ssl = True
+
+    monkeypatch.setattr(email_sender, "smtplib", types.SimpleNamespace(SMTP=SMTP, SMTP_SSL=SMTP_SSL))
+    return SMTP
+
+
+@pytest.mark.parametrize(
+    "cfg,expect_tls,expect_login",
+    [(TLS_CFG, True, True), (SSL_CFG, False, False)],
+    ids=["starttls", "ssl"],
+)
+def test_send_email(monkeypatch, smtp_class, cfg, expect_tls, expect_login):
+    monkeypatch.setattr(email_sender, "get_smtp_config", lambda: cfg)
 
-
-@pytest.fixture(autouse=True)
-def reset_instances():
-    DummySMTP.instances.clear()
-    yield
-    DummySMTP.instances.clear()
-
-
-def test_send_email_tls_success(monkeypatch):
-    # Arrange: config with STARTTLS
-    monkeypatch.setattr(
-        email_sender, "get_smtp_config",
-        lambda: {
-            "HOST": "smtp.test",
-            "PORT": 587,
-            "USER": "user@test",
-            "PASSWORD": "secret",
-            "FROM": "Daily Notes <no-reply@test>",
-            "USE_TLS": True,
-            "USE_SSL": False,
-        },
-    )
-    # Patch SMTP class used inside email_sender
-    monkeypatch.setattr(email_sender, "smtplib", types.SimpleNamespace(SMTP=DummySMTP, SMTP_SSL=DummySMTP_SSL))
-
-    # Act
     ok = email_sender.send_email("boss@example.com", "Subject A", "Hello body")
 
-    # Assert
     assert ok is True
-    assert len(DummySMTP.instances) == 1
-    inst = DummySMTP.instances[0]
-    assert inst.host == "smtp.test"
-    assert inst.port == 587
-    assert inst.started_tls is True  # STARTTLS path
-    assert inst.logged_in is True
+    assert len(smtp_class.instances) == 1
+    inst = smtp_class.instances[0]
+    assert inst.host == cfg["HOST"]
+    assert inst.port == cfg["PORT"]
+    assert inst.ssl is cfg["USE_SSL"]
+    # STARTTLS only on the plain-socket path; SSL is encrypted from the start
+    assert inst.started_tls is expect_tls
+    # No login when user/password not provided
+    assert inst.logged_in is expect_login
     assert len(inst.sent_messages) == 1
     msg = inst.sent_messages[0]
     assert msg["To"] == "boss@example.com"
-    assert msg["From"] == "Daily Notes <no-reply@test>"
+    assert msg["From"] == cfg["FROM"]
     assert msg["Subject"] == "Subject A"
 
 
-def test_send_email_ssl_success(monkeypatch):
-    # Arrange: config with SSL
-    monkeypatch.setattr(
-        email_sender, "get_smtp_config",
-        lambda: {
-            "HOST": "smtp.ssl.test",
-            "PORT": 465,
-            "USER": None,
-            "PASSWORD": None,
-            "FROM": "no-reply@ssl.test",
-            "USE_TLS": False,
-            "USE_SSL": True,
-        },
-    )
-    # SMTP and SMTP_SSL both patched
-    monkeypatch.setattr(email_sender, "smtplib", types.SimpleNamespace(SMTP=DummySMTP, SMTP_SSL=DummySMTP_SSL))
-
-    ok = email_sender.send_email("boss@example.com", "Subject B", "Hello SSL")
-
-    assert ok is True
-    assert len(DummySMTP.instances) == 1
-    inst = DummySMTP.instances[0]
-    assert inst.host == "smtp.ssl.test"
-    assert inst.port == 465
-    # SSL path does not require starttls
-    assert inst.started_tls is False
-    # No login when user/password not provided
-    assert inst.logged_in is False
-    assert inst.sent_messages and inst.sent_messages[0]["Subject"] == "Subject B"
-
-
-def test_send_email_invalid_recipient(monkeypatch):
+def test_send_email_invalid_recipient(monkeypatch, smtp_class):
     # Provide any config
-    monkeypatch.setattr(
-        email_sender, "get_smtp_config",
-        lambda: {
-            "HOST": "smtp.test",
-            "PORT": 587,
-            "USER": "user@test",
-            "PASSWORD": "secret",
-            "FROM": "no-reply@test",
-            "USE_TLS": True,
-            "USE_SSL": False,
-        },
-    )
-    # Patch SMTP to prevent real network
-    monkeypatch.setattr(email_sender, "smtplib", types.SimpleNamespace(SMTP=DummySMTP, SMTP_SSL=DummySMTP_SSL))
+    monkeypatch.setattr(email_sender, "get_smtp_config", lambda: TLS_CFG)
 
     with pytest.raises(email_sender.EmailSendError):
         email_sender.send_email("invalid", "Sub", "Body")
 
+
+def test_email_sender_reuses_one_connection(monkeypatch, smtp_class):
+    monkeypatch.setattr(email_sender, "get_smtp_config", lambda: TLS_CFG)
+
+    recipients = ["a@example.com", "b@example.com", "c@example.com"]
+    with email_sender.EmailSender() as sender:
+        for address in recipients:
+            assert sender.send(address, "Weekly", "Body") is True
+
+    # One handshake for the whole batch
+    assert len(smtp_class.instances) == 1
+    inst = smtp_class.instances[0]
+    assert inst.started_tls is True
+    assert [m["To"] for m in inst.sent_messages] == recipients
+
+
+def test_send_email_batch_encodes_body_once(monkeypatch, smtp_class):
+    monkeypatch.setattr(email_sender, "get_smtp_config", lambda: PLAIN_CFG)
+    built = []
+    real_mime = email_sender.MIMEText
+    monkeypatch.setattr(email_sender, "MIMEText", lambda *a, **kw: built.append(1) or real_mime(*a, **kw))
+
+    recipients = [f"{name}@example.com" for name in "abc"]
+    sent = []
+    monkeypatch.setattr(smtp_class, "send_message", lambda self, msg: sent.append(msg.get_all("To")))
+
+    assert email_sender.send_email_batch(recipients, "Weekly", "Body") == 3
+    assert len(built) == 1
+    assert len(smtp_class.instances) == 1
+    assert sent == [[address] for address in recipients]
+
+
+def test_send_email_batch_rejects_invalid_before_sending(monkeypatch, smtp_class):
+    monkeypatch.setattr(email_sender, "get_smtp_config", lambda: TLS_CFG)
+
+    with pytest.raises(email_sender.EmailSendError):
+        email_sender.send_email_batch(["a@example.com", "invalid"], "Sub", "Body")
+    assert smtp_class.instances == []
+
+
+def test_resolve_host_caches_lookups(monkeypatch):
+    calls = []
+
+    def fake_getaddrinfo(host, port, type=0):
+        calls.append(host)
+        return [(2, 1, 6, "", ("203.0.113.5", port))]
+
+    monkeypatch.setattr(email_sender.socket, "getaddrinfo", fake_getaddrinfo)
+    monkeypatch.setattr(email_sender, "_DNS_CACHE", {})
+
+    assert email_sender._resolve_host("smtp.test", 587) == "203.0.113.5"
+    assert email_sender._resolve_host("smtp.test", 587) == "203.0.113.5"
+    # IP literals never hit the resolver
+    assert email_sender._resolve_host("198.51.100.7", 587) == "198.51.100.7"
+    assert calls == ["smtp.test"]
+
+
+def test_get_smtp_config_reads_section_then_env(monkeypatch):
+    for name in ("SMTP_HOST", "SMTP_PORT", "SMTP_USE_TLS"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(email_sender, "load_secrets", lambda: ChainMap({"smtp.HOST": "smtp.test", "smtp.PORT": "587"}))
+    cfg = email_sender.get_smtp_config()
+    assert cfg["HOST"] == "smtp.test" and cfg["PORT"] == 587 and cfg["USE_TLS"] is True
+
+    # Flat SMTP_* keys are only read from the environment, not from secrets
+    monkeypatch.setattr(email_sender, "load_secrets", lambda: ChainMap({"SMTP_HOST": "st.test", "SMTP_PORT": "25"}))
+    assert email_sender.get_smtp_config() is None
+
+    monkeypatch.setenv("SMTP_HOST", "env.test")
+    monkeypatch.setenv("SMTP_PORT", "25")
+    monkeypatch.setenv("SMTP_USE_TLS", "false")
+    cfg = email_sender.get_smtp_config()
+    assert cfg["HOST"] == "env.test" and cfg["PORT"] == 25 and cfg["USE_TLS"] is False
+
+
+def test_get_smtp_config_takes_whole_section_from_one_source(monkeypatch):
+    st_layer = {"smtp.HOST": "st.test", "smtp.PORT": "465", "smtp.USE_SSL": True}
+    file_layer = {"smtp.HOST": "file.test", "smtp.PORT": "587", "smtp.PASSWORD": "file-secret"}
+    monkeypatch.setattr(email_sender, "load_secrets", lambda: ChainMap(st_layer, file_layer))
+    cfg = email_sender.get_smtp_config()
+    # st.secrets wins and none of its missing fields are filled in from the file
+    assert cfg["HOST"] == "st.test" and cfg["PORT"] == 465 and cfg["USE_SSL"] is True
+    assert cfg["PASSWORD"] is None
+
+    # An incomplete section in st.secrets falls through to the file as a whole
+    del st_layer["smtp.PORT"]
+    cfg = email_sender.get_smtp_config()
+    assert cfg["HOST"] == "file.test" and cfg["PORT"] == 587 and cfg["PASSWORD"] == "file-secret"
+    assert cfg["USE_SSL"] is False
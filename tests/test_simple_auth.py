@@ -0,0 +1,60 @@
+"""
+Unit tests for the authentication service.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from src.components import simple_auth
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    """A service at bcrypt's minimum cost so hashing stays fast."""
+    monkeypatch.setattr(simple_auth.SimpleAuthService, '_load_auth_config',
+                        lambda self: {**simple_auth.DEFAULT_AUTH_CONFIG, 'bcrypt_rounds': 4})
+    return simple_auth.SimpleAuthService()
+
+
+def test_login_unknown_user_checks_dummy_hash(monkeypatch, auth):
+    """Test an unknown username still costs one bcrypt check, against the dummy hash."""
+    monkeypatch.setattr(simple_auth.db_manager, 'get_user_by_username', lambda username: None)
+    checked = []
+    real_checkpw = simple_auth.bcrypt.checkpw
+    monkeypatch.setattr(simple_auth.bcrypt, 'checkpw',
+                        lambda password, hashed: checked.append(hashed) or real_checkpw(password, hashed))
+
+    assert auth.login_user('nobody', 'secret') is None
+    assert checked == [simple_auth._dummy_hash(4).encode('ascii')]
+
+
+@pytest.mark.parametrize("elapsed,expected_rounds", [
+    (0.5, simple_auth.BCRYPT_MIN_ROUNDS),   # slower than the target even at the floor
+    (0.05, 12),                             # 0.1s at 11, 0.2s at 12, 0.4s would overshoot
+    (0.000001, simple_auth.BCRYPT_MAX_ROUNDS),  # fast host is capped
+], ids=["clamped_to_min", "calibrated", "clamped_to_max"])
+def test_auto_calibrate_clamps_rounds(monkeypatch, auth, elapsed, expected_rounds):
+    """Test the calibrated cost doubles per round up to the target, within the min/max bounds."""
+    monkeypatch.setattr(simple_auth.bcrypt, 'hashpw', lambda password, salt: b'')
+    clock = iter([0.0, elapsed])
+    monkeypatch.setattr(simple_auth, 'time', SimpleNamespace(perf_counter=lambda: next(clock)))
+
+    assert auth._auto_calibrate(target_seconds=0.25) == expected_rounds
+    assert auth.config['bcrypt_rounds'] == expected_rounds
+
+
+@pytest.mark.parametrize("password", [
+    "x" * 1000,
+    "é" * 100,        # 2-byte characters: cut at exactly 36 of them
+    "a" + "😀" * 30,  # 4-byte characters: the cut lands inside one
+], ids=["ascii", "two_byte", "cut_mid_character"])
+def test_bcrypt_input_keeps_first_72_utf8_bytes(password):
+    """Test only the first 72 UTF-8 bytes reach bcrypt, whatever the character widths."""
+    result = simple_auth._bcrypt_input(password)
+    assert len(result) == simple_auth.BCRYPT_MAX_PASSWORD_BYTES
+    assert result == password.encode('utf-8')[:simple_auth.BCRYPT_MAX_PASSWORD_BYTES]
+
+
+def test_bcrypt_input_short_password_unchanged():
+    """Test passwords under the limit are encoded whole."""
+    assert simple_auth._bcrypt_input("pässwörd") == "pässwörd".encode('utf-8')
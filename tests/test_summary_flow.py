@@ -1,7 +1,11 @@
 import importlib.util
 import os
+import smtplib
+
 import pytest
 
+from src.utils import parse_subject
+
 
 class DummyDB:
     def __init__(self):
@@ -15,8 +19,8 @@ class DummyDB:
     def get_weekly_notes(self, uid):
         return [{"content": "Did great things", "created_at": None}]
 
-    def save_sent_email(self, user_id, to_email, subject, body, status='queued'):
-        self.saved.append((user_id, to_email, subject, body, status))
+    def save_sent_email(self, user_id, to_email, subject, body, status='queued', error_message=None):
+        self.saved.append((user_id, to_email, subject, body, status, error_message))
         return 101
 
     def update_sent_email_status(self, email_id, status, error_message=None):
@@ -24,8 +28,10 @@ class DummyDB:
         return True
 
 
-def load_summary_module():
-    # Load the Summary page module directly from its file path
+@pytest.fixture(scope="session")
+def summary_module():
+    # Load the Summary page module directly from its file path, once per session;
+    # executing the page imports streamlit and every page dependency
     path = os.path.join('pages', '0_🧾_Summary.py')
     spec = importlib.util.spec_from_file_location("summary_page", path)
     module = importlib.util.module_from_spec(spec)
@@ -35,27 +41,31 @@ def load_summary_module():
 
 
 def test_subject_parsing_logic_from_draft():
-    # This test validates the subject/body parsing logic used in Summary page
+    # The Summary page splits the edited draft with this helper
     draft = "Subject: Weekly Summary\n\n- point 1\n- point 2"
 
-    # Equivalent of the parsing logic in the page
-    subject = "Weekly Update"
-    body_text = draft
-    if draft.startswith("Subject:"):
-        first_line, _, rest = draft.partition("\n")
-        subject = first_line.replace("Subject:", "").strip() or subject
-        body_text = rest.lstrip("\n")
+    subject, body_text = parse_subject(draft)
 
     assert subject == "Weekly Summary"
     assert body_text.startswith("- point 1")
     assert "point 2" in body_text
 
 
-def test_db_methods_called_in_flow(monkeypatch):
+@pytest.mark.parametrize("draft, expected", [
+    ("- point 1", ("Weekly Update", "- point 1")),
+    ("Subject:   \nBody", ("Weekly Update", "Body")),
+    ("Subject: Only a subject", ("Only a subject", "")),
+    ("Hello\nSubject: not first", ("Weekly Update", "Hello\nSubject: not first")),
+])
+def test_parse_subject_edge_cases(draft, expected):
+    assert parse_subject(draft) == expected
+
+
+def test_db_methods_called_in_flow(monkeypatch, summary_module):
     # Verify our db layer calls happen in the page context
     dummy_db = DummyDB()
 
-    summary = load_summary_module()
+    summary = summary_module
 
     # Monkeypatch db_manager used by the page module
     monkeypatch.setattr(summary, 'db_manager', dummy_db)
@@ -69,3 +79,29 @@ def test_db_methods_called_in_flow(monkeypatch):
     assert ok is True
     assert dummy_db.updated
 
+
+@pytest.mark.parametrize("error", [
+    OSError("Connection refused"),
+    smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+], ids=["os_error", "smtp_disconnected"])
+def test_send_failure_is_recorded(monkeypatch, summary_module, error):
+    """Test errors send_email does not wrap in EmailSendError are still recorded as failed."""
+    dummy_db = DummyDB()
+    monkeypatch.setattr(summary_module, 'db_manager', dummy_db)
+
+    def failing_send(*args):
+        raise error
+    monkeypatch.setattr(summary_module, 'send_email', failing_send)
+
+    assert summary_module.send_and_record(1, 'boss@example.com', 'Subject A', 'Body A') is False
+    assert dummy_db.saved == [(1, 'boss@example.com', 'Subject A', 'Body A', 'failed', str(error))]
+
+
+def test_sent_email_is_recorded_once(monkeypatch, summary_module):
+    """Test a successful send is recorded exactly once, as sent."""
+    dummy_db = DummyDB()
+    monkeypatch.setattr(summary_module, 'db_manager', dummy_db)
+    monkeypatch.setattr(summary_module, 'send_email', lambda *args: True)
+
+    assert summary_module.send_and_record(1, 'boss@example.com', 'Subject A', 'Body A') is True
+    assert dummy_db.saved == [(1, 'boss@example.com', 'Subject A', 'Body A', 'sent', None)]
@@ -1,281 +1,329 @@
 """
 Test suite for the tagging system functionality.
 """
-import unittest
-from unittest.mock import MagicMock, patch
-import sys
-import os
-
-# Add the parent directory to the path to import from src
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from src.components.database import DatabaseManager
-
-
-class TestTaggingSystem(unittest.TestCase):
-    """Test cases for the tagging system."""
-
-    def setUp(self):
-        """Set up test fixtures."""
-        self.db_manager = DatabaseManager()
-        self.test_user_id = 1
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_create_tag_success(self, mock_get_connection):
-        """Test successful tag creation."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = [123]  # Mock tag ID
-        mock_get_connection.return_value = mock_conn
-        
-        result = self.db_manager.create_tag(self.test_user_id, "Test Tag", "#ff0000")
-        
-        self.assertEqual(result, 123)
-        mock_cursor.execute.assert_called_once()
-        mock_conn.commit.assert_called_once()
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_create_duplicate_tag(self, mock_get_connection):
-        """Test creating a duplicate tag returns None."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_get_connection.return_value = mock_conn
-        
-        # Simulate IntegrityError for duplicate tag
-        from psycopg2 import IntegrityError
-        mock_cursor.execute.side_effect = IntegrityError("duplicate key")
-        
-        result = self.db_manager.create_tag(self.test_user_id, "Duplicate Tag", "#ff0000")
-        
-        self.assertIsNone(result)
-        mock_conn.rollback.assert_called_once()
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_get_user_tags(self, mock_get_connection):
-        """Test retrieving user tags."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_get_connection.return_value = mock_conn
-        
-        # Mock tag data
-        mock_tags = [
-            {'id': 1, 'name': 'Professional', 'color': '#1f77b4', 'created_at': '2024-01-01'},
-            {'id': 2, 'name': 'Personal', 'color': '#ff7f0e', 'created_at': '2024-01-01'}
-        ]
-        mock_cursor.fetchall.return_value = mock_tags
-        
-        result = self.db_manager.get_user_tags(self.test_user_id)
-        
-        self.assertEqual(len(result), 2)
-        self.assertEqual(result[0]['name'], 'Professional')
-        self.assertEqual(result[1]['name'], 'Personal')
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_save_note_with_tag(self, mock_get_connection):
-        """Test saving a note with a tag."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = [456]  # Mock note ID
-        mock_get_connection.return_value = mock_conn
-        
-        result = self.db_manager.save_note_with_tag(
-            self.test_user_id, 
-            "Test note content", 
-            "2024-01-01", 
-            123  # tag_id
-        )
-        
-        self.assertEqual(result, 456)
-        # Should execute two queries: one for note, one for tag association
-        self.assertEqual(mock_cursor.execute.call_count, 2)
-        mock_conn.commit.assert_called_once()
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_save_note_without_tag(self, mock_get_connection):
-        """Test saving a note without a tag."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = [456]  # Mock note ID
-        mock_get_connection.return_value = mock_conn
-        
-        result = self.db_manager.save_note_with_tag(
-            self.test_user_id, 
-            "Test note content", 
-            "2024-01-01", 
-            None  # no tag
-        )
-        
-        self.assertEqual(result, 456)
-        # Should execute only one query for the note
-        self.assertEqual(mock_cursor.execute.call_count, 1)
-        mock_conn.commit.assert_called_once()
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_delete_tag(self, mock_get_connection):
-        """Test deleting a tag."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.rowcount = 1  # Mock successful deletion
-        mock_get_connection.return_value = mock_conn
-        
-        result = self.db_manager.delete_tag(self.test_user_id, 123)
-        
-        self.assertTrue(result)
-        mock_cursor.execute.assert_called_once()
-        mock_conn.commit.assert_called_once()
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_create_default_tags(self, mock_get_connection):
-        """Test creating default tags for a user."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.side_effect = [[1], [2], [3]]  # Mock tag IDs
-        mock_get_connection.return_value = mock_conn
-        
-        result = self.db_manager.create_default_tags(self.test_user_id)
-        
-        self.assertTrue(result)
-        # Should create 3 default tags
-        self.assertEqual(mock_cursor.execute.call_count, 3)
-
-    def test_tag_validation(self):
-        """Test tag name validation logic."""
-        # Test empty tag name
-        with patch.object(self.db_manager, 'create_tag') as mock_create:
-            mock_create.return_value = None
-            result = self.db_manager.create_tag(self.test_user_id, "", "#ff0000")
-            self.assertIsNone(result)
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_update_note_with_tag(self, mock_get_connection):
-        """Test updating an existing note with new tag and date."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = [1]  # Note exists
-        mock_get_connection.return_value = mock_conn
-
-        result = self.db_manager.update_note_with_tag(
-            note_id=1,
-            user_id=self.test_user_id,
-            content="Updated content",
-            note_date="2024-01-02",
-            tag_id=123
-        )
-
-        self.assertTrue(result)
-        # Should execute multiple queries: verify note exists, update note, handle tags
-        self.assertGreaterEqual(mock_cursor.execute.call_count, 3)
-        mock_conn.commit.assert_called_once()
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_update_note_unauthorized(self, mock_get_connection):
-        """Test updating a note that doesn't belong to the user."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = None  # Note doesn't exist or doesn't belong to user
-        mock_get_connection.return_value = mock_conn
-
-        result = self.db_manager.update_note_with_tag(
-            note_id=999,
-            user_id=self.test_user_id,
-            content="Hacked content",
-            note_date="2024-01-02",
-            tag_id=123
-        )
-
-        self.assertFalse(result)
-        # Should only execute the verification query
-        self.assertEqual(mock_cursor.execute.call_count, 1)
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_get_note_by_id(self, mock_get_connection):
-        """Test retrieving a specific note by ID."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_get_connection.return_value = mock_conn
-
-        # Mock note data with tag
-        mock_rows = [
-            {
-                'id': 1,
-                'content': 'Test note',
-                'note_date': '2024-01-01',
-                'created_at': '2024-01-01T10:00:00',
-                'tag_id': 123,
-                'tag_name': 'Professional',
-                'tag_color': '#1f77b4'
-            }
-        ]
-        mock_cursor.fetchall.return_value = mock_rows
-
-        result = self.db_manager.get_note_by_id(1, self.test_user_id)
-
-        self.assertIsNotNone(result)
-        self.assertEqual(result['id'], 1)
-        self.assertEqual(result['content'], 'Test note')
-        self.assertEqual(len(result['tags']), 1)
-        self.assertEqual(result['tags'][0]['name'], 'Professional')
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_get_note_by_id_not_found(self, mock_get_connection):
-        """Test retrieving a non-existent note."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchall.return_value = []  # No rows found
-        mock_get_connection.return_value = mock_conn
-
-        result = self.db_manager.get_note_by_id(999, self.test_user_id)
-
-        self.assertIsNone(result)
-
-    @patch.object(DatabaseManager, 'get_connection')
-    def test_update_note_remove_tag(self, mock_get_connection):
-        """Test removing a tag from a note."""
-        # Mock database connection and cursor
-        mock_conn = MagicMock()
-        mock_cursor = MagicMock()
-        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_cursor.fetchone.return_value = [1]  # Note exists
-        mock_get_connection.return_value = mock_conn
-
-        result = self.db_manager.update_note_with_tag(
-            note_id=1,
-            user_id=self.test_user_id,
-            content=None,  # Don't change content
-            note_date=None,  # Don't change date
-            tag_id=0  # Remove tag (special value)
-        )
-
-        self.assertTrue(result)
-        # Should execute queries to verify note and remove tags
-        self.assertGreaterEqual(mock_cursor.execute.call_count, 2)
-
-    def tearDown(self):
-        """Clean up after tests."""
-        pass
-
-
-if __name__ == '__main__':
-    unittest.main()
+from unittest.mock import patch
+
+import pytest
+
+
+TEST_USER_ID = 1
+
+# Workload sizes for the round-trip guards: the number of statements a call sends
+# must not grow with the number of tags or notes involved.
+WORKLOADS = {"single": 1, "hundred": 100, "ten_thousand": 10_000}
+
+
+def test_create_tag_success(mock_db):
+    """Test successful tag creation."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchone_value = [123]  # Mock tag ID
+    
+    result = db_manager.create_tag(TEST_USER_ID, "Test Tag", "#ff0000")
+    
+    assert result == 123
+    assert len(cursor.queries) == 1
+    assert conn.commits == 2  # explicit commit before the cache is invalidated, then the block's
+    assert pool.putconn_count == 1
+
+
+def test_create_duplicate_tag(mock_db):
+    """Test creating a duplicate tag returns None."""
+    db_manager, conn, cursor, pool = mock_db
+    
+    # ON CONFLICT DO NOTHING returns no row for a duplicate tag name
+    cursor._fetchone_value = None
+    
+    result = db_manager.create_tag(TEST_USER_ID, "Duplicate Tag", "#ff0000")
+    
+    assert result is None
+    assert "ON CONFLICT (user_id, name) DO NOTHING" in cursor.queries[-1]
+    assert conn.commits == 1  # only the block's own; nothing was created to invalidate
+    assert pool.putconn_count == 1
+
+
+def test_get_user_tags(mock_db):
+    """Test retrieving user tags."""
+    db_manager, conn, cursor, pool = mock_db
+    
+    # Mock tag data
+    mock_tags = [
+        (1, 'Professional', '#1f77b4', '2024-01-01'),
+        (2, 'Personal', '#ff7f0e', '2024-01-01')
+    ]
+    cursor._fetchall_value = mock_tags
+    
+    result = db_manager.get_user_tags(TEST_USER_ID)
+    
+    assert len(result) == 2
+    assert result[0]['name'] == 'Professional'
+    assert result[1]['name'] == 'Personal'
+    assert pool.putconn_count == 1
+
+
+def test_get_user_tags_cached_until_tag_created(mock_db):
+    """Test repeated tag lookups are served from cache and invalidated on change."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchall_value = [(1, 'Professional', '#1f77b4', '2024-01-01')]
+    cursor._fetchone_value = [2]
+
+    db_manager.get_user_tags(TEST_USER_ID)
+    db_manager.get_user_tags(TEST_USER_ID)
+    assert len(cursor.queries) == 2  # PREPARE + EXECUTE on the pooled connection
+
+    db_manager.create_tag(TEST_USER_ID, "New Tag", "#ff0000")
+    db_manager.get_user_tags(TEST_USER_ID)
+    assert len(cursor.queries) == 4  # INSERT, then EXECUTE of the already-prepared lookup
+    assert pool.putconn_count == 3
+
+
+def test_save_note_with_tag(mock_db):
+    """Test saving a note with a tag."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchone_value = [456]  # Mock note ID
+    
+    result = db_manager.save_note_with_tag(
+        TEST_USER_ID, 
+        "Test note content", 
+        "2024-01-01", 
+        123  # tag_id
+    )
+    
+    assert result == 456
+    # Should execute two queries: one for note, one for tag association
+    assert len(cursor.queries) == 2
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+    assert pool.putconn_count == 1
+
+
+def test_save_notes_with_tags_bulk(mock_db):
+    """Test a batch of tagged notes and their tag links is one statement, not one per note."""
+    db_manager, conn, cursor, pool = mock_db
+    rows = [(f"Note {i}", "2024-01-01", 123 if i % 2 else None) for i in range(1000)]
+    cursor._fetchall_value = [(i,) for i in range(1000)]
+
+    result = db_manager.save_notes_with_tags_bulk(TEST_USER_ID, rows)
+
+    assert result == list(range(1000))
+    assert len(cursor.queries) == 1
+    # Ids are paired with input rows by ordinality in SQL, not by RETURNING order
+    assert 'WITH ORDINALITY' in cursor.queries[-1]
+    assert 'INSERT INTO note_tags' in cursor.queries[-1]
+    contents, note_dates, tag_ids, user_id = cursor.params[-1]
+    assert contents[1] == "Note 1" and note_dates[1] == "2024-01-01"
+    assert tag_ids[:2] == [None, 123]
+    assert user_id == TEST_USER_ID
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+    assert pool.putconn_count == 1
+
+
+def test_save_note_without_tag(mock_db):
+    """Test saving a note without a tag."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchone_value = [456]  # Mock note ID
+    
+    result = db_manager.save_note_with_tag(
+        TEST_USER_ID, 
+        "Test note content", 
+        "2024-01-01", 
+        None  # no tag
+    )
+    
+    assert result == 456
+    # Should execute only one query for the note
+    assert len(cursor.queries) == 1
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+    assert pool.putconn_count == 1
+
+
+def test_delete_tag(mock_db):
+    """Test deleting a tag."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor.rowcount = 1  # Mock successful deletion
+    
+    result = db_manager.delete_tag(TEST_USER_ID, 123)
+    
+    assert result
+    assert len(cursor.queries) == 1
+    assert conn.commits == 2  # explicit commit before the cache is invalidated, then the block's
+    assert pool.putconn_count == 1
+
+
+@patch('psycopg2.extras.execute_values')
+def test_create_default_tags(mock_execute_values, mock_db):
+    """Test creating default tags for a user."""
+    db_manager, conn, cursor, pool = mock_db
+    mock_execute_values.return_value = [(1,), (2,), (3,)]  # Mock tag IDs
+    
+    result = db_manager.create_default_tags(TEST_USER_ID)
+    
+    assert result
+    # All 3 default tags go out in a single multi-row INSERT
+    mock_execute_values.assert_called_once()
+    assert len(mock_execute_values.call_args[0][2]) == 3
+    assert mock_execute_values.call_args.kwargs['page_size'] >= 3
+    assert conn.commits == 2  # explicit commit before the cache is invalidated, then the block's
+    assert pool.putconn_count == 1
+
+
+def test_tag_validation(db_manager):
+    """Test tag name validation logic."""
+    # Test empty tag name
+    with patch.object(db_manager, 'create_tag') as mock_create:
+        mock_create.return_value = None
+        result = db_manager.create_tag(TEST_USER_ID, "", "#ff0000")
+        assert result is None
+
+
+def test_update_note_with_tag(mock_db):
+    """Test updating an existing note with new tag and date."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchone_value = [1]  # Note exists
+
+    result = db_manager.update_note_with_tag(
+        note_id=1,
+        user_id=TEST_USER_ID,
+        content="Updated content",
+        note_date="2024-01-02",
+        tag_id=123
+    )
+
+    assert result
+    # Ownership check, note update and tag replacement share one statement
+    assert len(cursor.queries) == 1
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+    assert pool.putconn_count == 1
+
+
+def test_update_note_unauthorized(mock_db):
+    """Test updating a note that doesn't belong to the user."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchone_value = None  # Note doesn't exist or doesn't belong to user
+
+    result = db_manager.update_note_with_tag(
+        note_id=999,
+        user_id=TEST_USER_ID,
+        content="Hacked content",
+        note_date="2024-01-02",
+        tag_id=123
+    )
+
+    assert not result
+    # Ownership is enforced by the single update statement
+    assert len(cursor.queries) == 1
+    assert (conn.commits, conn.rollbacks) == (1, 0)  # only the block's own commit; no rows matched
+    assert pool.putconn_count == 1
+
+
+def test_get_note_by_id(mock_db):
+    """Test retrieving a specific note by ID."""
+    db_manager, conn, cursor, pool = mock_db
+
+    # Mock note data with tag
+    # One aggregated row per note; psycopg2 decodes the json tags column to a list
+    cursor._fetchone_value = (
+        1, 'Test note', '2024-01-01', '2024-01-01T10:00:00',
+        [{'id': 123, 'name': 'Professional', 'color': '#1f77b4'}]
+    )
+
+    result = db_manager.get_note_by_id(1, TEST_USER_ID)
+
+    assert result is not None
+    assert result['id'] == 1
+    assert result['content'] == 'Test note'
+    assert len(result['tags']) == 1
+    assert result['tags'][0]['name'] == 'Professional'
+    assert pool.putconn_count == 1
+
+
+def test_get_note_by_id_not_found(mock_db):
+    """Test retrieving a non-existent note."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchone_value = None  # No rows found
+
+    result = db_manager.get_note_by_id(999, TEST_USER_ID)
+
+    assert result is None
+    assert pool.putconn_count == 1
+
+
+def test_get_notes_by_ids_binds_ids_as_one_array(mock_db):
+    """Test several notes are fetched with a single ANY(array) query."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchall_value = [
+        (2, 'Second', '2024-01-02', '2024-01-02T10:00:00', []),
+        (1, 'First', '2024-01-01', '2024-01-01T10:00:00',
+         [{'id': 123, 'name': 'Professional', 'color': '#1f77b4'}]),
+    ]
+
+    result = db_manager.get_notes_by_ids(TEST_USER_ID, [1, 2])
+
+    assert [note['id'] for note in result] == [2, 1]
+    assert result[1]['tags'][0]['name'] == 'Professional'
+    assert len(cursor.queries) == 1
+    query, params = cursor.queries[-1], cursor.params[-1]
+    assert "n.id = ANY(%s)" in query
+    assert params == (TEST_USER_ID, [1, 2])
+    assert pool.putconn_count == 1
+
+
+def test_update_note_remove_tag(mock_db):
+    """Test removing a tag from a note."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchone_value = [1]  # Note exists
+
+    result = db_manager.update_note_with_tag(
+        note_id=1,
+        user_id=TEST_USER_ID,
+        content=None,  # Don't change content
+        note_date=None,  # Don't change date
+        tag_id=0  # Remove tag (special value)
+    )
+
+    assert result
+    # Tag removal runs in the same statement as the ownership check
+    assert len(cursor.queries) == 1
+    assert cursor.params[-1]['tag_id'] == 0
+    assert pool.putconn_count == 1
+
+
+@pytest.mark.parametrize("n", WORKLOADS.values(), ids=WORKLOADS.keys())
+def test_get_user_tags_round_trips_constant(mock_db, n):
+    """Test listing N tags is one query however many tags the user has."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchall_value = [(i, f'Tag {i}', '#1f77b4', '2024-01-01') for i in range(n)]
+
+    result = db_manager.get_user_tags(TEST_USER_ID)
+
+    assert len(result) == n
+    assert len(cursor.queries) <= 2
+    assert pool.putconn_count == 1
+
+
+@pytest.mark.parametrize("n", WORKLOADS.values(), ids=WORKLOADS.keys())
+@patch('psycopg2.extras.execute_values')
+def test_create_tags_bulk_round_trips_constant(mock_execute_values, mock_db, n):
+    """Test creating N tags is a single multi-row INSERT."""
+    db_manager, conn, cursor, pool = mock_db
+    mock_execute_values.return_value = [(i,) for i in range(n)]
+
+    result = db_manager.create_tags_bulk(TEST_USER_ID, [(f'Tag {i}', '#1f77b4') for i in range(n)])
+
+    assert len(result) == n
+    mock_execute_values.assert_called_once()
+    # execute_values sends one INSERT per page; a single page covers all n rows
+    assert mock_execute_values.call_args.kwargs['page_size'] >= n
+    assert len(cursor.queries) <= 2
+    assert pool.putconn_count == 1
+
+
+@pytest.mark.parametrize("n", WORKLOADS.values(), ids=WORKLOADS.keys())
+def test_save_notes_with_tags_bulk_round_trips_constant(mock_db, n):
+    """Test saving N tagged notes is a single statement for any N."""
+    db_manager, conn, cursor, pool = mock_db
+    cursor._fetchall_value = [(i,) for i in range(n)]
+
+    result = db_manager.save_notes_with_tags_bulk(TEST_USER_ID, [(f'Note {i}', None, 123) for i in range(n)])
+
+    assert len(result) == n
+    assert len(cursor.queries) == 1
+    assert pool.putconn_count == 1
@@ -1,180 +1,148 @@
 """
 Unit tests for utility functions.
 """
-import unittest
-import sys
-import os
-
-# Add the parent directory to the path to import from src
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from src.calculations.utils import (
-    validate_note_content, 
-    sanitize_input, 
-    format_error_message, 
-    truncate_text
-)
-
-
-class TestValidateNoteContent(unittest.TestCase):
-    """Test cases for validate_note_content function."""
-    
-    def test_valid_note(self):
-        """Test validation of valid note content."""
-        valid_note = "This is a valid note with sufficient content."
-        is_valid, error_message = validate_note_content(valid_note)
-        self.assertTrue(is_valid)
-        self.assertEqual(error_message, "")
-    
-    def test_empty_note(self):
-        """Test validation of empty note content."""
-        empty_note = ""
-        is_valid, error_message = validate_note_content(empty_note)
-        self.assertFalse(is_valid)
-        self.assertEqual(error_message, "Note content cannot be empty.")
-    
-    def test_whitespace_only_note(self):
-        """Test validation of whitespace-only note content."""
-        whitespace_note = "   \n\t   "
-        is_valid, error_message = validate_note_content(whitespace_note)
-        self.assertFalse(is_valid)
-        self.assertEqual(error_message, "Note content cannot be empty.")
-    
-    def test_too_short_note(self):
-        """Test validation of too short note content."""
-        short_note = "Hi"
-        is_valid, error_message = validate_note_content(short_note)
-        self.assertFalse(is_valid)
-        self.assertEqual(error_message, "Note must be at least 5 characters long.")
-    
-    def test_too_long_note(self):
-        """Test validation of too long note content."""
-        long_note = "x" * 5001
-        is_valid, error_message = validate_note_content(long_note)
-        self.assertFalse(is_valid)
-        self.assertEqual(error_message, "Note cannot exceed 5000 characters.")
-    
-    def test_dangerous_content(self):
-        """Test validation of potentially dangerous content."""
-        dangerous_note = "This note contains <script>alert('xss')</script> content."
-        is_valid, error_message = validate_note_content(dangerous_note)
-        self.assertFalse(is_valid)
-        self.assertEqual(error_message, "Note contains potentially harmful content.")
-
-    def test_markdown_content_should_be_valid(self):
-        """Test that common Markdown patterns are not flagged as harmful."""
-        # Test cases that were previously causing false positives
-        markdown_examples = [
-            "Configuration = something important",
-            "The reason = we need to fix this",
-            "function = lambda x: x + 1",
-            "# Heading\n\n**Bold text** and *italic*\n\n- List item\n- Another item",
-            "```python\ncode_block = 'this should work'\n```",
-            "Link: [text](https://example.com)",
-            "Image: ![alt](image.png)",
-            "> Blockquote text",
-            "| Table | Header |\n|-------|--------|\n| Cell  | Data   |"
-        ]
-
-        for markdown_text in markdown_examples:
-            with self.subTest(markdown=markdown_text[:50] + "..."):
-                is_valid, error_message = validate_note_content(markdown_text)
-                self.assertTrue(is_valid, f"Markdown content should be valid: {markdown_text[:50]}...")
-                self.assertEqual(error_message, "")
-
-    def test_actual_dangerous_event_handlers(self):
-        """Test that actual dangerous HTML event handlers are still caught."""
-        dangerous_examples = [
-            '<div onclick="alert(1)">Click me</div>',
-            '<img onload="malicious()">',
-            '<body onmouseover="hack()">',
-            'onsubmit="steal_data()"',
-            'ONCLICK="ALERT(1)"'  # Case insensitive
-        ]
-
-        for dangerous_text in dangerous_examples:
-            with self.subTest(dangerous=dangerous_text):
-                is_valid, error_message = validate_note_content(dangerous_text)
-                self.assertFalse(is_valid, f"Dangerous content should be invalid: {dangerous_text}")
-                self.assertEqual(error_message, "Note contains potentially harmful content.")
-
-
-class TestSanitizeInput(unittest.TestCase):
-    """Test cases for sanitize_input function."""
-    
-    def test_normal_text(self):
-        """Test sanitization of normal text."""
-        normal_text = "This is normal text with spaces and punctuation!"
-        result = sanitize_input(normal_text)
-        self.assertEqual(result, normal_text)
-    
-    def test_empty_input(self):
-        """Test sanitization of empty input."""
-        empty_input = ""
-        result = sanitize_input(empty_input)
-        self.assertEqual(result, "")
-    
-    def test_none_input(self):
-        """Test sanitization of None input."""
-        none_input = None
-        result = sanitize_input(none_input)
-        self.assertEqual(result, "")
-    
-    def test_whitespace_trimming(self):
-        """Test trimming of leading and trailing whitespace."""
-        whitespace_text = "   text with spaces   "
-        result = sanitize_input(whitespace_text)
-        self.assertEqual(result, "text with spaces")
-    
-    def test_newlines_and_tabs_preserved(self):
-        """Test that newlines and tabs are preserved."""
-        text_with_formatting = "Line 1\nLine 2\tTabbed"
-        result = sanitize_input(text_with_formatting)
-        self.assertEqual(result, text_with_formatting)
-
-
-class TestTruncateText(unittest.TestCase):
-    """Test cases for truncate_text function."""
-    
-    def test_short_text(self):
-        """Test truncation of text shorter than max length."""
-        short_text = "Short text"
-        result = truncate_text(short_text, 50)
-        self.assertEqual(result, short_text)
-    
-    def test_long_text(self):
-        """Test truncation of text longer than max length."""
-        long_text = "This is a very long text that should be truncated"
-        result = truncate_text(long_text, 20)
-        self.assertEqual(result, "This is a very lo...")
-        self.assertEqual(len(result), 20)
-    
-    def test_exact_length(self):
-        """Test text that is exactly the max length."""
-        exact_text = "Exactly twenty chars"  # 20 characters
-        result = truncate_text(exact_text, 20)
-        self.assertEqual(result, exact_text)
-
-
-class TestFormatErrorMessage(unittest.TestCase):
-    """Test cases for format_error_message function."""
-    
-    def test_operational_error(self):
-        """Test formatting of OperationalError."""
-        class MockOperationalError(Exception):
-            pass
-        MockOperationalError.__name__ = 'OperationalError'
-        
-        error = MockOperationalError("Connection failed")
-        result = format_error_message(error)
-        self.assertEqual(result, "Database connection issue. Please try again later.")
-    
-    def test_unknown_error(self):
-        """Test formatting of unknown error type."""
-        error = ValueError("Some value error")
-        result = format_error_message(error)
-        self.assertEqual(result, "An unexpected error occurred: Some value error")
-
-
-if __name__ == '__main__':
-    unittest.main()
+import pytest
+
+from src.calculations import utils
+
+_LONG_NOTE = "x" * 5001
+_DANGEROUS_NOTE = "This note contains <script>alert('xss')</script> content."
+_SHORT_TEXT = "Short text"
+_LONG_TEXT = "This is a very long text that should be truncated"
+_EXACT_TEXT = "Exactly twenty chars"  # 20 characters
+# Sliced per case by the truncate_text boundary sweep
+_BASE = "abcdefghij" * 1000
+
+
+# Stands in for psycopg2's OperationalError, which format_error_message matches by name
+class _FakeOperationalError(Exception):
+    pass
+
+
+_FakeOperationalError.__name__ = 'OperationalError'
+
+
+@pytest.mark.parametrize("content,expected_valid,expected_msg", [
+    ("This is a valid note with sufficient content.", True, ""),
+    ("", False, utils.MSG_EMPTY),
+    ("   \n\t   ", False, utils.MSG_EMPTY),
+    ("Hi", False, utils.MSG_TOO_SHORT),
+    (_LONG_NOTE, False, utils.MSG_TOO_LONG),
+    (_DANGEROUS_NOTE, False, utils.MSG_HARMFUL),
+], ids=["valid", "empty", "whitespace_only", "too_short", "too_long", "dangerous"])
+def test_validate_note_content(content, expected_valid, expected_msg):
+    """Test validation outcome and message for each rule."""
+    is_valid, error_message = utils.validate_note_content(content)
+    assert is_valid is expected_valid
+    assert error_message == expected_msg
+
+
+# Cases that were previously causing false positives
+@pytest.mark.parametrize("markdown_text", [
+    "Configuration = something important",
+    "The reason = we need to fix this",
+    "function = lambda x: x + 1",
+    "# Heading\n\n**Bold text** and *italic*\n\n- List item\n- Another item",
+    "```python\ncode_block = 'this should work'\n```",
+    "Link: [text](https://example.com)",
+    "Image: ![alt](image.png)",
+    "> Blockquote text",
+    "| Table | Header |\n|-------|--------|\n| Cell  | Data   |"
+])
+def test_markdown_content_should_be_valid(markdown_text):
+    """Test that common Markdown patterns are not flagged as harmful."""
+    is_valid, error_message = utils.validate_note_content(markdown_text)
+    assert is_valid, f"Markdown content should be valid: {markdown_text[:50]}..."
+    assert error_message == ""
+
+
+@pytest.mark.parametrize("dangerous_text", [
+    '<div onclick="alert(1)">Click me</div>',
+    '<img onload="malicious()">',
+    '<body onmouseover="hack()">',
+    'onsubmit="steal_data()"',
+    'ONCLICK="ALERT(1)"'  # Case insensitive
+])
+def test_actual_dangerous_event_handlers(dangerous_text):
+    """Test that actual dangerous HTML event handlers are still caught."""
+    is_valid, error_message = utils.validate_note_content(dangerous_text)
+    assert not is_valid, f"Dangerous content should be invalid: {dangerous_text}"
+    assert error_message == utils.MSG_HARMFUL
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("This is normal text with spaces and punctuation!", "This is normal text with spaces and punctuation!"),
+    ("", ""),
+    (None, ""),
+    ("   text with spaces   ", "text with spaces"),
+    ("Line 1\nLine 2\tTabbed", "Line 1\nLine 2\tTabbed"),
+    ("\x00Null\x07 bytes\r\n", "Null bytes"),
+], ids=["normal", "empty", "none", "whitespace_trimming", "newlines_and_tabs_preserved", "control_chars_removed"])
+def test_sanitize_input(text, expected):
+    """Test sanitized output for each kind of input."""
+    assert utils.sanitize_input(text) == expected
+
+
+@pytest.mark.parametrize("func,cache,args,kwargs", [
+    (utils.validate_note_content, utils._validate_short_note_content, ("Hi",), {}),
+    (utils.validate_note_content, utils._validate_short_note_content, (), {"content": "Hi"}),
+    (utils.sanitize_input, utils._sanitize_short_input, ("  text with spaces  ",), {}),
+    (utils.sanitize_input, utils._sanitize_short_input, (), {"text": "  text with spaces  "}),
+], ids=["validate_note_content", "validate_note_content_keyword", "sanitize_input", "sanitize_input_keyword"])
+def test_validators_are_memoized(func, cache, args, kwargs):
+    """Test repeated short input returns the identical cached result, however it is passed."""
+    utils.clear_caches()
+    first = func(*args, **kwargs)
+    assert func(*args, **kwargs) is first
+    assert cache.cache_info().hits == 1
+
+
+@pytest.mark.parametrize("func,cache", [
+    (utils.validate_note_content, utils._validate_short_note_content),
+    (utils.sanitize_input, utils._sanitize_short_input),
+], ids=["validate_note_content", "sanitize_input"])
+def test_long_inputs_are_not_memoized(func, cache):
+    """Test note bodies longer than MEMOIZE_MAX_LENGTH never enter the cache."""
+    utils.clear_caches()
+    long_text = "x" * (utils.MEMOIZE_MAX_LENGTH + 1)
+    assert func(long_text) == func(long_text)
+    assert cache.cache_info().currsize == 0
+
+
+@pytest.mark.parametrize("text,max_length,expected", [
+    (_SHORT_TEXT, 50, _SHORT_TEXT),
+    (_LONG_TEXT, 20, "This is a very lo..."),
+    (_EXACT_TEXT, 20, _EXACT_TEXT),
+], ids=["short", "long", "exact_length"])
+def test_truncate_text(text, max_length, expected):
+    """Test truncation keeps text within max_length, adding an ellipsis when cut."""
+    result = utils.truncate_text(text, max_length)
+    assert result == expected
+    assert len(result) <= max_length
+
+
+@pytest.mark.parametrize("n,max_length,expected_len", [
+    (10, 50, 10),
+    (50, 20, 20),
+    (19, 20, 19),
+    (20, 20, 20),
+    (21, 20, 20),
+    (10_000, 100, 100),
+])
+def test_truncate_text_boundaries(n, max_length, expected_len):
+    """Test lengths around max_length: only text longer than it is cut and ellipsized."""
+    result = utils.truncate_text(_BASE[:n], max_length)
+    assert len(result) == expected_len
+    if n > max_length:
+        assert result == _BASE[:max_length - 3] + "..."
+    else:
+        assert result == _BASE[:n]
+
+
+@pytest.mark.parametrize("error,expected", [
+    (_FakeOperationalError("Connection failed"), "Database connection issue. Please try again later."),
+    (ValueError("Some value error"), "An unexpected error occurred: Some value error"),
+], ids=["operational_error", "unknown_error"])
+def test_format_error_message(error, expected):
+    """Test known error types map to friendly text and others fall back to the message."""
+    assert utils.format_error_message(error) == expected
@@ -0,0 +1,34 @@
+"""
+Property-based tests for utility functions (requires hypothesis).
+"""
+import string
+
+import pytest
+
+pytest.importorskip("hypothesis")
+from hypothesis import given, settings, strategies as st
+
+from src.calculations import utils
+
+
+@settings(max_examples=200, deadline=None)
+@given(content=st.text(max_size=10_000))
+def test_validate_note_content_properties(content):
+    """Test the empty/length rules hold for arbitrary text, in the validator's order."""
+    is_valid, error_message = utils.validate_note_content(content)
+    stripped = content.strip()
+    if not stripped:
+        assert (is_valid, error_message) == (False, utils.MSG_EMPTY)
+    elif len(stripped) < 5:
+        assert (is_valid, error_message) == (False, utils.MSG_TOO_SHORT)
+    elif len(content) > 5000:
+        assert (is_valid, error_message) == (False, utils.MSG_TOO_LONG)
+    else:
+        assert (is_valid, error_message) in {(True, ""), (False, utils.MSG_HARMFUL)}
+
+
+@settings(max_examples=200, deadline=None)
+@given(content=st.text(alphabet=string.ascii_letters + string.digits + ".,!?#*-", min_size=5, max_size=5000))
+def test_plain_text_notes_are_valid(content):
+    """Test text without markup characters is never flagged."""
+    assert utils.validate_note_content(content) == (True, "")
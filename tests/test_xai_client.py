@@ -0,0 +1,103 @@
+import json
+from collections import ChainMap
+
+from src.integrations import xai_client
+
+
+class DummyStreamResponse:
+    def __init__(self, content_pieces, status_code=200):
+        self.status_code = status_code
+        self.closed = False
+        events = [
+            "data: " + json.dumps({"choices": [{"delta": {"content": piece}}]})
+            for piece in content_pieces
+        ]
+        self._lines = events + ["", "data: [DONE]"]
+
+    @property
+    def text(self):
+        raise AssertionError("streamed body should not be read whole")
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+    def close(self):
+        self.closed = True
+
+
+class DummySession:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        return self.response
+
+
+def test_format_notes_dedupes_and_groups_by_day(monkeypatch):
+    monkeypatch.setattr(xai_client, "PROMPT_MAX_NOTES", 3)
+    notes = [
+        {"content": "Shipped the  release", "created_at": "2024-01-02T16:00:00"},
+        {"content": "shipped the release", "created_at": "2024-01-02T09:00:00"},
+        {"content": "Reviewed PRs", "created_at": "2024-01-02T08:00:00"},
+        {"content": "Planned sprint", "created_at": "2024-01-01T10:00:00"},
+        {"content": "Wrote docs", "created_at": "2024-01-01T09:00:00"},
+        {"content": "Fixed CI", "created_at": None},
+    ]
+
+    block = xai_client._format_notes_for_prompt(notes)
+
+    assert block == (
+        "Tue 01/02:\n"
+        "- Shipped the  release\n"
+        "- Reviewed PRs\n"
+        "Mon 01/01:\n"
+        "- Planned sprint\n"
+        "... and 2 more"
+    )
+
+
+def test_iter_json_fields_yields_items_as_they_complete():
+    chunks = ['{"subj', 'ect": "Week', ' 12", "bullets": ["Shipped \\"v2\\"', '", "Fixed bugs"', ']}']
+
+    fields = list(xai_client._iter_json_fields(chunks))
+
+    assert fields == [("subject", "Week 12"), ("bullets", 'Shipped "v2"'), ("bullets", "Fixed bugs")]
+
+
+def test_draft_weekly_email_streams_progress(monkeypatch):
+    content = json.dumps({"subject": "Weekly Update", "bullets": ["Did A", "Did B"]})
+    resp = DummyStreamResponse([content[i:i + 7] for i in range(0, len(content), 7)])
+    session = DummySession(resp)
+    monkeypatch.setattr(xai_client, "get_xai_api_key", lambda: "key")
+    monkeypatch.setattr(xai_client, "_SESSION", session)
+    monkeypatch.setattr(xai_client, "_HAS_REQUESTS", True)
+    progress = []
+
+    draft = xai_client.draft_weekly_email(
+        [{"content": "Did A", "created_at": None}], "Alice", recipient_name="Bob", on_progress=progress.append
+    )
+
+    assert draft == "Subject: Weekly Update\n\nHi Bob,\n\n- Did A\n- Did B\n\nRegards,\nAlice"
+    assert progress[-1] == draft
+    assert len(progress) == 3
+    assert "Did B" not in progress[1]
+    _, kwargs = session.calls[0]
+    assert kwargs["stream"] is True and json.loads(kwargs["data"])["stream"] is True
+    assert resp.closed
+
+
+def test_get_xai_api_key_prefers_streamlit_secrets_over_file(monkeypatch):
+    st_layer, file_layer, env = {"XAI_API_KEY": "st-key"}, {"xai.API_KEY": "file-key"}, {"XAI_API_KEY": "env-key"}
+    monkeypatch.setattr(xai_client, "load_secrets", lambda: ChainMap(st_layer, file_layer, env))
+    # A flat key in st.secrets still beats the file's [xai] section
+    assert xai_client.get_xai_api_key() == "st-key"
+
+    # Within one source, [xai].API_KEY wins over the flat key
+    st_layer["xai.API_KEY"] = "st-section-key"
+    assert xai_client.get_xai_api_key() == "st-section-key"
+
+    st_layer.clear()
+    file_layer.clear()
+    assert xai_client.get_xai_api_key() == "env-key"